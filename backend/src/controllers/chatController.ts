@@ -4,14 +4,34 @@ import fs from 'fs';
 import path from 'path';
 
 export const handleChat = async (req: Request, res: Response) => {
-  const { message, language = 'tr', conversation_history = [], tool_name = null } = req.body;
+  const { message, language = 'tr', conversation_history = [], tool_name = null, session_id = null, stream = false } = req.body;
 
   try {
+    if (stream) {
+      // SSE akışını Python servisinden parça parça ilet
+      const upstream = await axios.post('http://localhost:8000/api/chat', {
+        message,
+        language,
+        conversation_history,
+        tool_name,
+        session_id,
+        stream: true
+      }, { responseType: 'stream' });
+
+      res.setHeader('Content-Type', 'text/event-stream');
+      res.setHeader('Cache-Control', 'no-cache');
+      res.setHeader('X-Accel-Buffering', 'no');
+      res.flushHeaders();
+      upstream.data.pipe(res);
+      return;
+    }
+
     const response = await axios.post('http://localhost:8000/api/chat', { 
       message, 
       language,
       conversation_history,
-      tool_name
+      tool_name,
+      session_id
     });
     const data = response.data;
 
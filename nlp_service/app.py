@@ -1,8 +1,49 @@
-from flask import Flask, request, jsonify
-from rag import find_best_tool, find_tool_specific_answer
+from startup import warm_up  # başlangıç süresi ölçümü için ilk import
+from itertools import chain
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+import metrics
+from resilience import UpstreamUnavailable
+from rag import find_best_tool_with_intent, find_tool_specific_answer, matched_tool, stream_tool_specific_answer
+from session_store import record_turn, sessions
+from streaming import SSE_HEADERS, SSE_MIMETYPE, chat_events, wants_stream
 
 app = Flask(__name__)
 
+# Araç indeksini ve intent centroid'lerini istek gelmeden önce bir kez kur
+# (eksik embedding'ler 'python build_index.py' ile fork'tan önce tamamlanır)
+warm_up()
+
+@app.before_request
+def start_timing():
+    g.request_started = metrics.start_request()
+
+@app.after_request
+def finish_timing(response):
+    # Yol etiketi URL kuralından alınır; session_id gibi parametreler metrik sayısını büyütmez
+    path = request.url_rule.rule if request.url_rule else "unmatched"
+    response.headers.update(metrics.finish_request(g.request_started, path, response.status_code))
+    return response
+
+@app.errorhandler(UpstreamUnavailable)
+def upstream_unavailable(e):
+    # Araç bazlı yanıtlar tools.json'a düşer; buraya yalnızca öneri yolunun embedding'i reddedilince gelinir
+    print(f"⚠️ {e}")
+    return jsonify({"error": "Servis şu anda yoğun, lütfen biraz sonra tekrar deneyin."}), 503, {"Retry-After": str(e.retry_after)}
+
+def general_chunks(message: str, language: str, conversation_history: list, session_id: str = None):
+    result, intent_result = find_best_tool_with_intent(message, language, conversation_history)
+    if session_id:
+        record_turn(session_id, message, result, intent_result)
+    yield result
+
+def tool_chunks(tool_name: str, message: str, language: str, conversation_history: list, session_id: str = None):
+    parts = []
+    for chunk in stream_tool_specific_answer(tool_name, message, language, conversation_history):
+        parts.append(chunk)
+        yield chunk
+    if session_id:
+        record_turn(session_id, message, "".join(parts), tool_name=tool_name)
+
 @app.route("/api/chat", methods=["POST"])
 def chat():
     data = request.get_json()
@@ -10,15 +51,46 @@ def chat():
     language = data.get("language", "tr")
     conversation_history = data.get("conversation_history", [])
     tool_name = data.get("tool_name", None)  # Tool-specific chat için
-    
+    session_id = data.get("session_id", None)  # Sunucu tarafı oturum için
+
+    # Oturum modunda geçmiş istemciden değil, sunucudaki sınırlı oturum kaydından gelir
+    if session_id and not conversation_history:
+        conversation_history = sessions.history(session_id, message)
+
+    if wants_stream(data, request.headers.get("Accept", "")):
+        # Akışlı mod: parçalar üretildikçe SSE olayı olarak gönderilir
+        if tool_name:
+            chunks = tool_chunks(tool_name, message, language, conversation_history, session_id)
+        else:
+            chunks = general_chunks(message, language, conversation_history, session_id)
+        # İlk parça yanıt başlamadan alınır: upstream reddederse (UpstreamUnavailable) ASGI modundaki gibi
+        # 503 + Retry-After dönülür, ayrıca genel sohbette önerilen araç meta olayında gönderilebilir
+        first = next(chunks, None)
+        events = chat_events(chain([] if first is None else [first], chunks), tool_name, language,
+                             matched_tool(tool_name, first))
+        return Response(stream_with_context(events), mimetype=SSE_MIMETYPE, headers=SSE_HEADERS)
+
+    intent_result = None
     if tool_name:
         # Tool-specific chat
         result = find_tool_specific_answer(tool_name, message, language, conversation_history)
     else:
         # Genel chat
-        result = find_best_tool(message, language, conversation_history)
-    
+        result, intent_result = find_best_tool_with_intent(message, language, conversation_history)
+
+    if session_id:
+        record_turn(session_id, message, result, intent_result, tool_name)
+
     return jsonify({"response": result})
 
+@app.route("/api/chat/session/<session_id>", methods=["DELETE"])
+def clear_session(session_id):
+    sessions.clear(session_id)
+    return jsonify({"cleared": session_id})
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype=metrics.PROMETHEUS_MIMETYPE)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000)
@@ -0,0 +1,130 @@
+"""
+/api/chat için async (ASGI) sunum modu. İstek/yanıt sözleşmesi app.py ile aynıdır.
+
+    hypercorn asgi_app:app --bind 0.0.0.0:8000
+"""
+from startup import warm_up  # başlangıç süresi ölçümü için ilk import
+
+import asyncio
+
+from quart import Quart, Response, g, request, jsonify
+
+import metrics
+
+from async_rag import (
+    find_best_tool_with_intent_async, find_tool_specific_answer_async, stream_tool_specific_answer_async, UpstreamSaturated,
+)
+from rag import matched_tool
+from resilience import UpstreamUnavailable
+from session_store import record_turn, sessions
+from streaming import SSE_HEADERS, SSE_MIMETYPE, chat_events_async, wants_stream
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def startup():
+    # Engelleyici indeks yüklemesi event loop dışında, istek kabul edilmeden önce yapılır
+    await asyncio.to_thread(warm_up)
+
+
+@app.before_request
+async def start_timing():
+    g.request_started = metrics.start_request()
+
+
+@app.after_request
+async def finish_timing(response):
+    # Yol etiketi URL kuralından alınır; session_id gibi parametreler metrik sayısını büyütmez
+    path = request.url_rule.rule if request.url_rule else "unmatched"
+    response.headers.update(metrics.finish_request(g.request_started, path, response.status_code))
+    return response
+
+
+def _saturated_response(e):
+    # UpstreamSaturated (kuyruk dolu) ya da UpstreamUnavailable (devre açık); ikisi de retry_after taşır
+    print(f"⚠️ {e}")
+    return jsonify({"error": "Servis şu anda yoğun, lütfen biraz sonra tekrar deneyin."}), 503, {"Retry-After": str(e.retry_after)}
+
+
+async def _general_chunks(message: str, language: str, conversation_history: list, session_id: str = None):
+    result, intent_result = await find_best_tool_with_intent_async(message, language, conversation_history)
+    if session_id:
+        await asyncio.to_thread(record_turn, session_id, message, result, intent_result)
+    yield result
+
+
+async def _tool_chunks(tool_name: str, message: str, language: str, conversation_history: list, session_id: str = None):
+    parts = []
+    async for chunk in stream_tool_specific_answer_async(tool_name, message, language, conversation_history):
+        parts.append(chunk)
+        yield chunk
+    if session_id:
+        await asyncio.to_thread(record_turn, session_id, message, "".join(parts), tool_name=tool_name)
+
+
+async def _prepend(first, chunks):
+    if first is not None:
+        yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+@app.route("/api/chat", methods=["POST"])
+async def chat():
+    data = await request.get_json()
+    message = data.get("message", "")
+    language = data.get("language", "tr")
+    conversation_history = data.get("conversation_history", [])
+    tool_name = data.get("tool_name", None)  # Tool-specific chat için
+    session_id = data.get("session_id", None)  # Sunucu tarafı oturum için
+
+    # Oturum modunda geçmiş istemciden değil, sunucudaki sınırlı oturum kaydından gelir
+    if session_id and not conversation_history:
+        conversation_history = await asyncio.to_thread(sessions.history, session_id, message)
+
+    if wants_stream(data, request.headers.get("Accept", "")):
+        if tool_name:
+            chunks = _tool_chunks(tool_name, message, language, conversation_history, session_id)
+        else:
+            chunks = _general_chunks(message, language, conversation_history, session_id)
+        # İlk parça yanıt başlamadan beklenir; böylece kuyruk doluysa hâlâ 503 dönülebilir
+        try:
+            first = await anext(chunks, None)
+        except (UpstreamSaturated, UpstreamUnavailable) as e:
+            return _saturated_response(e)
+        events = chat_events_async(_prepend(first, chunks), tool_name, language, matched_tool(tool_name, first))
+        return Response(events, mimetype=SSE_MIMETYPE, headers=SSE_HEADERS)
+
+    intent_result = None
+    try:
+        if tool_name:
+            # Tool-specific chat
+            result = await find_tool_specific_answer_async(tool_name, message, language, conversation_history)
+        else:
+            # Genel chat
+            result, intent_result = await find_best_tool_with_intent_async(message, language, conversation_history)
+    except (UpstreamSaturated, UpstreamUnavailable) as e:
+        return _saturated_response(e)
+
+    if session_id:
+        # Oturum yazımı SQLite işlemi (BEGIN IMMEDIATE, 5 sn meşgul bekleme) olabilir; event loop dışında yapılır
+        await asyncio.to_thread(record_turn, session_id, message, result, intent_result, tool_name)
+
+    return jsonify({"response": result})
+
+
+@app.route("/api/chat/session/<session_id>", methods=["DELETE"])
+async def clear_session(session_id):
+    await asyncio.to_thread(sessions.clear, session_id)
+    return jsonify({"cleared": session_id})
+
+
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    return Response(metrics.render(), mimetype=metrics.PROMETHEUS_MIMETYPE)
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8000)
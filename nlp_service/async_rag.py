@@ -0,0 +1,385 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import numpy as np
+import openai
+
+from cache import cache_key
+from metrics import count_fallback, count_openai_call, span
+from resilience import UPSTREAM_ERRORS, UpstreamUnavailable, get_upstream
+from tool_index import EMBEDDING_MODEL
+from doc_index import has_doc_index, build_doc_prompt, format_doc_answer, DOC_ANSWER_MODEL, DOC_ANSWER_MAX_TOKENS
+from rag import (
+    INTENT_CENTROID_WAIT, INTENT_MODEL, TOOL_HANDLERS, TOOL_STREAM_HANDLERS, answer_for_intent, build_intent_prompt, embedder, embedding_cache,
+    ensure_embedding_available, get_tool_index, intent_cache, intent_classifier, lexical_intent, parse_intent_response, tool_fallback_answer, tool_handler_error_message,
+    upstream_unavailable_answer,
+)
+
+# Paylaşılan bağlantı havuzu ve upstream başına eşzamanlılık sınırları
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+UPSTREAM_MAX_WAITING = int(os.getenv("UPSTREAM_MAX_WAITING", "200"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "2"))
+
+
+class UpstreamSaturated(Exception):
+    """Upstream kuyruğu dolu ya da kuyrukta bekleme süresi aşıldı; istemciye 503 + Retry-After döner"""
+
+    def __init__(self, upstream: str, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__(f"{upstream} upstream'i şu anda dolu")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """
+    Bir upstream'e aynı anda gidebilecek istek sayısını sınırlar.
+    Fazla istekler en fazla queue_timeout saniye kuyrukta bekler; kuyrukta max_waiting'den fazla
+    istek varsa ya da bekleme süresi dolarsa UpstreamSaturated fırlatılır.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float = UPSTREAM_QUEUE_TIMEOUT,
+                 max_waiting: int = UPSTREAM_MAX_WAITING):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self._semaphore = None
+        self._waiting = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self._waiting >= self.max_waiting:
+            raise UpstreamSaturated(self.name)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamSaturated(self.name) from None
+        finally:
+            self._waiting -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+@asynccontextmanager
+async def guarded(upstream: str, model: str):
+    """
+    Senkron yolla aynı devre kesiciyi paylaşır: devre açıksa beklemeden UpstreamUnavailable fırlatılır,
+    çağrının sonucu devre kesiciye bildirilir. Yeniden deneme ve zaman aşımı AsyncOpenAI client'ına aittir.
+    """
+    upstream = get_upstream(upstream)
+    upstream.check(model)
+    try:
+        yield
+    except UpstreamSaturated:
+        # İstek upstream'e ulaşmadı; upstream'in sağlığı hakkında bilgi yok
+        upstream.breaker(model).record(None)
+        raise
+    except Exception as e:
+        upstream.record(model, e)
+        raise
+    except BaseException:
+        # İptal edildi ya da akış yarıda bırakıldı
+        upstream.breaker(model).record(None)
+        raise
+    upstream.record(model)
+
+
+limiters = {
+    "chat": UpstreamLimiter("chat", int(os.getenv("OPENAI_CHAT_CONCURRENCY", "32"))),
+    "embedding": UpstreamLimiter("embedding", int(os.getenv("OPENAI_EMBEDDING_CONCURRENCY", "64"))),
+    "web_search": UpstreamLimiter("web_search", int(os.getenv("WEB_SEARCH_CONCURRENCY", "8"))),
+}
+
+_async_client = None
+
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """Tüm istekler tek bir AsyncOpenAI client'ı ve onun bağlantı havuzunu paylaşır"""
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=OPENAI_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+                timeout=OPENAI_TIMEOUT,
+            ),
+        )
+    return _async_client
+
+
+async def _cache_get(cache, key: str):
+    """SQLite'a da yazan cache'ler event loop'u bloklamasın diye thread'de okunur"""
+    return await asyncio.to_thread(cache.get, key) if cache.persistent else cache.get(key)
+
+
+async def _cache_set(cache, key: str, value):
+    if cache.persistent:
+        await asyncio.to_thread(cache.set, key, value)
+    else:
+        cache.set(key, value)
+
+
+async def get_tool_index_async():
+    """
+    Araç indeksi dosyalar değiştiyse yeniden kurulur (tools.json okuma, matris yayınlama); bu iş thread'de yapılır.
+    İsteğin geri kalanındaki senkron get_tool_index() çağrıları hazır indeksi damga kontrolüyle döndürür.
+    """
+    return await asyncio.to_thread(get_tool_index)
+
+
+async def chat_completion_async(prompt: str, model: str, **kwargs) -> str:
+    async with guarded("chat", model), limiters["chat"].slot():
+        response = await get_async_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+    count_openai_call("chat", model, response.usage)
+    return response.choices[0].message.content
+
+
+async def stream_chat_completion_async(prompt: str, model: str, **kwargs):
+    """Chat completion token'larını geldikçe yield eder; akış boyunca chat slot'u tutulur"""
+    with span("summarization"):
+        async with guarded("chat", model), limiters["chat"].slot():
+            stream = await get_async_client().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            usage = None
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        count_openai_call("chat", model, usage)
+
+
+async def get_embedding_async(text: str) -> np.ndarray:
+    with span("embedding"):
+        # Yerel backend CPU'da milisaniyenin altında çalışır; upstream slot'u ve cache gerekmez
+        if not embedder.remote:
+            return embedder.embed(text)
+        key = cache_key(text, EMBEDDING_MODEL)
+        embedding = await _cache_get(embedding_cache, key)
+        if embedding is None:
+            async with guarded("embedding", EMBEDDING_MODEL), limiters["embedding"].slot():
+                response = await get_async_client().embeddings.create(model=EMBEDDING_MODEL, input=text)
+            count_openai_call("embedding", EMBEDDING_MODEL, response.usage)
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            await _cache_set(embedding_cache, key, embedding)
+        return embedding
+
+
+async def _llm_intent_async(intent_key: str, prompt: str) -> dict:
+    try:
+        content = await chat_completion_async(prompt, INTENT_MODEL, temperature=0.1)
+    except UPSTREAM_ERRORS as e:
+        print(f"⚠️ LLM intent sınıflandırması yapılamadı: {e}")
+        count_fallback("intent_llm")
+        return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.5, "source": "fallback"}
+    if intent_cache.persistent:
+        return await asyncio.to_thread(parse_intent_response, content, intent_key)
+    return parse_intent_response(content, intent_key)
+
+
+async def detect_intent_async(message: str, conversation_history: list = None, embedding_task=None) -> dict:
+    """
+    rag.detect_intent_and_context'in async karşılığı; embedding_task centroid eşleşmesi için kullanılır.
+    Embedding INTENT_CENTROID_WAIT içinde hazır olmazsa LLM çağrısı paralel başlar; centroid eşleşirse iptal edilir.
+    """
+    rule_result = intent_classifier.match_rules(message, conversation_history)
+    if rule_result is not None:
+        return rule_result
+
+    intent_key, prompt = build_intent_prompt(message, conversation_history)
+    cached_result = await _cache_get(intent_cache, intent_key)
+    if cached_result is not None:
+        return dict(cached_result)
+
+    llm_task = None
+    query_embedding = None
+    if embedding_task is not None:
+        done, _ = await asyncio.wait([embedding_task], timeout=INTENT_CENTROID_WAIT)
+        if not done:
+            llm_task = asyncio.ensure_future(_llm_intent_async(intent_key, prompt))
+        try:
+            query_embedding = await embedding_task
+        except UpstreamSaturated:
+            if llm_task is not None:
+                llm_task.cancel()
+            raise
+        except Exception as e:
+            print(f"❌ Query embedding error: {e}")
+
+    local_result = intent_classifier.match_centroid(
+        (lambda: query_embedding) if query_embedding is not None else None, conversation_history
+    )
+    if local_result is not None:
+        if llm_task is not None:
+            llm_task.cancel()
+        return local_result
+    if llm_task is not None:
+        return await llm_task
+    return await _llm_intent_async(intent_key, prompt)
+
+
+class _QueryEmbeddingPending(Exception):
+    """answer_for_intent embedding'e ihtiyaç duydu ama henüz hazır değil"""
+
+
+def _query_embedding_pending():
+    raise _QueryEmbeddingPending()
+
+
+async def _answer(user_input: str, language: str, conversation_history: list, intent_result: dict, embedding_task) -> str:
+    # Önce embedding'siz dene: selam, teşekkür ve kategori takiplerinde embedding hiç beklenmez
+    try:
+        return answer_for_intent(user_input, language, conversation_history, intent_result, _query_embedding_pending)
+    except _QueryEmbeddingPending:
+        pass
+    query_embedding = await embedding_task
+    return answer_for_intent(user_input, language, conversation_history, intent_result, lambda: query_embedding)
+
+
+async def find_best_tool_async(user_input: str, language: str = "tr", conversation_history: list = None) -> str:
+    """rag.find_best_tool'un async karşılığı; yanıtlar birebir aynıdır"""
+    return (await find_best_tool_with_intent_async(user_input, language, conversation_history))[0]
+
+
+async def find_best_tool_with_intent_async(user_input: str, language: str = "tr", conversation_history: list = None) -> tuple:
+    """rag.find_best_tool_with_intent'in async karşılığı: (yanıt, intent sonucu)"""
+    if conversation_history is None:
+        conversation_history = []
+
+    await get_tool_index_async()
+    with span("intent"):
+        intent_result = (intent_classifier.match_rules(user_input, conversation_history)
+                         or lexical_intent(user_input, conversation_history))
+    if intent_result is not None:
+        try:
+            response = answer_for_intent(user_input, language, conversation_history, intent_result, _query_embedding_pending)
+        except _QueryEmbeddingPending:
+            query_embedding = await get_embedding_async(user_input)
+            response = answer_for_intent(user_input, language, conversation_history, intent_result, lambda: query_embedding)
+        return response, intent_result
+
+    if embedding_cache.persistent:
+        await asyncio.to_thread(ensure_embedding_available, user_input)
+    else:
+        ensure_embedding_available(user_input)
+
+    # Sorgu embedding'i intent sınıflandırmasıyla paralel başlar
+    embedding_task = asyncio.ensure_future(get_embedding_async(user_input))
+    try:
+        with span("intent"):
+            intent_result = await detect_intent_async(user_input, conversation_history, embedding_task)
+        return await _answer(user_input, language, conversation_history, intent_result, embedding_task), intent_result
+    finally:
+        embedding_task.cancel()
+
+
+async def find_tool_specific_answer_async(tool_name: str, user_input: str, language: str = "tr",
+                                          conversation_history: list = None) -> str:
+    """rag.find_tool_specific_answer'ın async karşılığı"""
+    await get_tool_index_async()
+    if has_doc_index(tool_name):
+        try:
+            tool_info = get_tool_index().get(tool_name) or {}
+            query_embedding = await get_embedding_async(user_input)
+            # İlk kullanımda langchain import'u ve FAISS.load_local disk okuması yapılır
+            prompt = await asyncio.to_thread(build_doc_prompt, tool_name, user_input, query_embedding, language)
+            with span("summarization"):
+                answer = await chat_completion_async(prompt, DOC_ANSWER_MODEL, temperature=0.1, max_tokens=DOC_ANSWER_MAX_TOKENS)
+            return format_doc_answer(answer.strip(), language, tool_info.get("link", ""))
+        except UpstreamSaturated:
+            raise
+        except UpstreamUnavailable as e:
+            return upstream_unavailable_answer(tool_name, language, e)
+        except Exception as e:
+            print(f"❌ Doc index error for {tool_name}: {e}")
+            count_fallback("doc_index")
+
+    return await _tool_handler_answer_async(tool_name, user_input, language)
+
+
+async def _tool_handler_answer_async(tool_name: str, user_input: str, language: str = "tr") -> str:
+    if tool_name in TOOL_HANDLERS:
+        # Web araması senkron bir kütüphane; event loop'u bloklamaması için thread'de, sınırlı sayıda çalışır
+        async with limiters["web_search"].slot():
+            try:
+                return await asyncio.to_thread(TOOL_HANDLERS[tool_name], user_input, language)
+            except UpstreamUnavailable as e:
+                return upstream_unavailable_answer(tool_name, language, e)
+            except Exception as e:
+                print(f"❌ Tool-specific error for {tool_name}: {e}")
+                count_fallback("tool_handler")
+                return tool_handler_error_message(tool_name, language)
+
+    return tool_fallback_answer(tool_name, language)
+
+
+async def _iterate_in_thread(chunks):
+    """Senkron bir generator'ı event loop'u bloklamadan, her parçayı bir thread'de alarak dolaşır"""
+    done = object()
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+async def stream_tool_specific_answer_async(tool_name: str, user_input: str, language: str = "tr",
+                                            conversation_history: list = None):
+    """rag.stream_tool_specific_answer'ın async karşılığı"""
+    await get_tool_index_async()
+    if has_doc_index(tool_name):
+        started = False
+        try:
+            tool_info = get_tool_index().get(tool_name) or {}
+            query_embedding = await get_embedding_async(user_input)
+            # İlk kullanımda langchain import'u ve FAISS.load_local disk okuması yapılır
+            prompt = await asyncio.to_thread(build_doc_prompt, tool_name, user_input, query_embedding, language)
+            async for token in stream_chat_completion_async(prompt, DOC_ANSWER_MODEL, temperature=0.1,
+                                                            max_tokens=DOC_ANSWER_MAX_TOKENS):
+                started = True
+                yield token
+            footer = format_doc_answer("", language, tool_info.get("link", ""))
+            if footer:
+                yield footer
+            return
+        except UpstreamSaturated:
+            raise
+        except UpstreamUnavailable as e:
+            yield upstream_unavailable_answer(tool_name, language, e)
+            return
+        except Exception as e:
+            print(f"❌ Doc index error for {tool_name}: {e}")
+            count_fallback("doc_index")
+            if started:
+                return
+
+    if tool_name in TOOL_STREAM_HANDLERS:
+        async with limiters["web_search"].slot():
+            try:
+                async for chunk in _iterate_in_thread(TOOL_STREAM_HANDLERS[tool_name](user_input, language)):
+                    yield chunk
+            except UpstreamUnavailable as e:
+                yield upstream_unavailable_answer(tool_name, language, e)
+        return
+
+    yield await _tool_handler_answer_async(tool_name, user_input, language)
@@ -0,0 +1,528 @@
+"""
+nlp_service için tekrarlanabilir benchmark / yük testi. Gerçek API'ye tek bir istek gitmez.
+
+    python benchmark.py                                       # 15 araç, tüm senaryolar, eşzamanlılık 1 ve 8
+    python benchmark.py --tools 15,1000,10000 --concurrency 1,8,32 --output results.json
+    python benchmark.py --target http --chat-latency 0.8 --search-latency 0.5
+    python benchmark.py --compare eski.json yeni.json         # iki çalışmanın farkı
+
+OpenAI ve DuckDuckGo yerine ayrı bir süreçte çalışan yerel sahte sunucu kullanılır:
+    /v1/embeddings, /v1/chat/completions (stream dahil)  → OPENAI_BASE_URL ile gerçek client buraya bağlanır
+    /search                                              → duckduckgo_search.DDGS yerine geçen sahte arama
+Yanıtlar deterministiktir (metinden türetilen vektörler, sabit özetler), gecikmeler ayarlanabilir.
+
+Her katalog boyutu ayrı bir süreçte, geçici bir dizinde üretilen sentetik tools.json ile çalışır;
+böylece RSS değerleri birbirini etkilemez. Senaryolar: greeting, new_question, follow_up, alternative,
+tool_specific. Hedefler: function (find_best_tool / find_tool_specific_answer) ve http (/api/chat,
+süreç içinde threaded Flask sunucusu). Senaryo başına p50/p95/p99 gecikme, throughput, RSS ve
+istek başına upstream çağrı sayısı JSON olarak kaydedilir.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import argparse
+import platform
+import contextlib
+import tempfile
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SERVICE_DIR = Path(__file__).resolve().parent
+SCENARIOS = ("greeting", "new_question", "follow_up", "alternative", "tool_specific")
+TARGETS = ("function", "http")
+FAKE_EMBEDDING_DIM = 1536
+FAKE_ANSWER = "Bu araç, akademik çalışmalarda kaynak bulma ve özetleme için kullanılır."
+
+QUESTION_TEMPLATES = (
+    "{} için hangi aracı kullanmalıyım",
+    "ödevim için {} yapmam gerekiyor",
+    "{} konusunda yardımcı olacak bir araç var mı",
+    "which tool should I use for {}",
+)
+SYNTHETIC_WORDS = (
+    "analiz", "veri", "tez", "rapor", "not", "ders", "kaynak", "grafik", "tablo", "çeviri", "okuma", "yazma",
+    "proje", "deney", "istatistik", "bibliyografya", "anket", "makale", "özet", "sunum", "video", "quiz",
+    "planlama", "takvim", "ödev", "sınav", "kodlama", "matematik", "biyoloji", "tarih", "edebiyat", "dil",
+)
+TOOL_QUESTIONS = (
+    "Consensus nasıl çalışır", "Consensus ücretsiz mi", "Consensus hangi kaynakları tarar",
+    "How does Consensus rank papers", "Consensus ile literatür taraması nasıl yapılır",
+)
+
+
+# ---------------------------------------------------------------------------
+# Sahte upstream sunucusu (ayrı süreç)
+# ---------------------------------------------------------------------------
+
+def fake_vector(text: str) -> np.ndarray:
+    """Metindeki kelimelerden türetilen deterministik, normalize vektör; ortak bileşen benzerlikleri ada'ya yaklaştırır"""
+    vector = np.zeros(FAKE_EMBEDDING_DIM, dtype=np.float32)
+    for word in text.lower().split():
+        vector[zlib.crc32(word.strip(".,:;!?()\"'").encode("utf-8")) % FAKE_EMBEDDING_DIM] += 1.0
+    vector[0] += 5.0
+    return vector / np.linalg.norm(vector)
+
+
+def fake_intent(prompt: str) -> dict:
+    message = prompt.split("Current message:")[-1].split("Look for patterns")[0].lower()
+    if "başka" in message or "alternative" in message:
+        return {"intent": "TAKIP_SORU", "request_type": "alternative", "confidence": 0.9}
+    if "dil kontrol" in message or "grammar" in message:
+        return {"intent": "TAKIP_SORU", "request_type": "grammar", "confidence": 0.9}
+    return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.9}
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = {"embedding": 0.0, "chat": 0.0, "search": 0.0}
+    counts = None
+    counts_lock = None
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, name: str):
+        with self.counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _send_json(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            with self.counts_lock:
+                return self._send_json(dict(self.counts))
+        if self.path.startswith("/search"):
+            self._count("search")
+            time.sleep(self.latency["search"])
+            return self._send_json({"results": [
+                {"title": f"Consensus sonuç {i}", "href": f"https://example.org/{i}",
+                 "body": "Consensus, bilimsel makalelerden kanıta dayalı yanıtlar çıkaran bir arama motorudur."}
+                for i in range(5)
+            ]})
+        self.send_error(404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/embeddings"):
+            return self._embeddings(request)
+        if self.path.endswith("/chat/completions"):
+            return self._chat(request)
+        self.send_error(404)
+
+    def _embeddings(self, request: dict):
+        self._count("embeddings")
+        time.sleep(self.latency["embedding"])
+        inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_vector(text)
+            if request.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = [round(float(value), 6) for value in vector]
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(text.split()) for text in inputs)
+        self._send_json({"object": "list", "data": data, "model": request["model"],
+                         "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def _chat(self, request: dict):
+        self._count("chat")
+        time.sleep(self.latency["chat"])
+        prompt = request["messages"][-1]["content"]
+        content = json.dumps(fake_intent(prompt)) if "Respond ONLY in this JSON" in prompt else FAKE_ANSWER
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                 "total_tokens": len(prompt.split()) + len(content.split())}
+        base = {"id": "chatcmpl-benchmark", "created": int(time.time()), "model": request["model"]}
+        if not request.get("stream"):
+            return self._send_json({**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ]})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}, "finish_reason": None}
+            ]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def serve_fake_upstreams(port_queue, latency: dict):
+    FakeUpstreamHandler.latency = latency
+    FakeUpstreamHandler.counts = {}
+    FakeUpstreamHandler.counts_lock = threading.Lock()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstreamHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_fake_upstreams(latency: dict) -> tuple:
+    """Sahte sunucuyu ayrı bir süreçte başlatır; (süreç, taban URL) döndürür"""
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_fake_upstreams, args=(port_queue, latency), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+
+def upstream_counts(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        return json.loads(response.read())
+
+
+class FakeDDGS:
+    """duckduckgo_search.DDGS yerine geçer; aramaları sahte sunucunun /search uç noktasına yollar"""
+    base_url = None
+
+    def __init__(self, timeout: float = 10, **kwargs):
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def text(self, query: str, max_results: int = 5) -> list:
+        url = f"{self.base_url}/search?q={urllib.parse.quote(query)}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.loads(response.read())["results"][:max_results]
+
+
+# ---------------------------------------------------------------------------
+# Sentetik katalog ve istekler
+# ---------------------------------------------------------------------------
+
+def synthetic_catalogue(size: int, seed: int = 0) -> list:
+    """Gerçek tools.json'u size araca tamamlar; ek araçlar gerçek araçların deterministik varyasyonlarıdır"""
+    base = json.loads((SERVICE_DIR / "tools.json").read_text(encoding="utf-8"))
+    rng = random.Random(seed)
+    tools = [dict(tool) for tool in base[:size]]
+    for i in range(len(tools), size):
+        template = base[i % len(base)]
+        words = rng.sample(SYNTHETIC_WORDS, 3)
+        name = f"{template['tool']} {i}"
+        tools.append({
+            **template,
+            "tool": name,
+            "use": f"{template['use']} ve {words[0]}",
+            "academic_use": f"{template['academic_use']} Ayrıca {words[1]} ve {words[2]} çalışmalarında kullanılır.",
+            "academic_use_en": f"{template['academic_use_en']} Also used for {words[1]} and {words[2]}.",
+            "keywords": [f"{keyword} {words[0]}" for keyword in template["keywords"]] + [f"{words[1]} {words[2]}"],
+            "link": f"https://example.org/tools/{i}",
+        })
+    return tools
+
+
+def build_requests(scenario: str, count: int, tools: list, distinct: int = 0, seed: str = "0", start: int = 0) -> list:
+    """
+    Senaryo için (mesaj, dil, geçmiş, tool_name) listesi.
+    start: sorgu sayacının başlangıcı; farklı çalıştırmalar birbirinin cache'ini ısıtmasın diye ayrık aralıklar kullanılır.
+    distinct > 0 ise sorgular bu kadar farklı metin arasında döner (sıcak cache).
+    """
+    rng = random.Random(f"{seed}:{scenario}")
+    previous = tools[1 % len(tools)]
+    history = [
+        {"from": "user", "text": "sunum hazırlamak istiyorum"},
+        {"from": "bot", "text": f"{previous['tool']}: {previous['academic_use']}"},
+    ]
+    requests = []
+    for i in range(start, start + count):
+        n = i % distinct if distinct else i
+        if scenario == "greeting":
+            message = ("merhaba", "selam", "hello", "teşekkürler")[n % 4]
+            requests.append((message, "tr", [{"from": "user", "text": message}], None))
+        elif scenario == "new_question":
+            tool = tools[rng.randrange(len(tools))] if not distinct else tools[n % len(tools)]
+            # Tekil sayaç sorguyu cache'lerden kaçırır; anahtar kelime ve açıklama tabanlı sorular dönüşümlü
+            topic = tool["keywords"][n % len(tool["keywords"])] if n % 2 == 0 else " ".join(tool["use"].lower().split()[:4])
+            message = f"{QUESTION_TEMPLATES[n % len(QUESTION_TEMPLATES)].format(topic)} {n}"
+            requests.append((message, "tr", [{"from": "user", "text": message}], None))
+        elif scenario == "follow_up":
+            message = f"peki dil kontrolü için ne önerirsin {n}"
+            requests.append((message, "tr", history + [{"from": "user", "text": message}], None))
+        elif scenario == "alternative":
+            message = f"peki başka ne önerirsin {n}"
+            requests.append((message, "tr", history + [{"from": "user", "text": message}], None))
+        elif scenario == "tool_specific":
+            message = f"{TOOL_QUESTIONS[n % len(TOOL_QUESTIONS)]} {n}"
+            requests.append((message, "tr", [], "Consensus"))
+    return requests
+
+
+# ---------------------------------------------------------------------------
+# Ölçüm
+# ---------------------------------------------------------------------------
+
+def rss_mb() -> tuple:
+    """(anlık RSS, tepe RSS) MB cinsinden; ölçülemezse None"""
+    current = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+    return current, peak
+
+
+def _post_chat(url: str, body: dict) -> str:
+    request = urllib.request.Request(url, json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())["response"]
+
+
+def _service_output(verbose: bool):
+    """Servisin istek başına print çıktıları --verbose verilmedikçe bastırılır"""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def run_scenario(call, requests: list, concurrency: int) -> dict:
+    """İstekleri concurrency thread ile çalıştırır; gecikme yüzdelikleri ve throughput döndürür"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(request):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            call(*request)
+        except Exception as e:
+            with lock:
+                errors += 1
+            print(f"❌ Benchmark isteği başarısız: {e}", file=sys.stderr)
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, requests))
+    wall = time.perf_counter() - started
+
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist() if latencies else (None, None, None)
+    return {
+        "requests": len(requests),
+        "errors": errors,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "mean_ms": float(np.mean(latencies) * 1000) if latencies else None,
+        "throughput_rps": len(latencies) / wall if wall else None,
+    }
+
+
+def run_catalogue(args, size: int) -> dict:
+    """Tek bir katalog boyutunu bu süreçte çalıştırır (servis modülleri burada import edilir)"""
+    latency = {"embedding": args.embedding_latency, "chat": args.chat_latency, "search": args.search_latency}
+    upstream, base_url = start_fake_upstreams(latency)
+    workdir = Path(tempfile.mkdtemp(prefix=f"nlp-bench-{size}-"))
+    tools = synthetic_catalogue(size, args.seed)
+    (workdir / "tools.json").write_text(json.dumps(tools, ensure_ascii=False), encoding="utf-8")
+
+    # Servis modülleri import edilmeden önce: sahte upstream, geçici çalışma dizini, seçili embedder
+    os.environ.update({"OPENAI_BASE_URL": f"{base_url}/v1", "OPENAI_API_KEY": "benchmark", "EMBEDDER": args.embedder})
+    # Sahte upstream'in kotası yok; hız sınırları açıkça verilmedikçe kapalıdır (0 = sınırsız)
+    for name in ("OPENAI_CHAT_RPS", "OPENAI_EMBEDDING_RPS", "WEB_SEARCH_RPS"):
+        os.environ.setdefault(name, "0")
+    os.chdir(workdir)
+    sys.path.insert(0, str(SERVICE_DIR))
+    FakeDDGS.base_url = base_url
+    import duckduckgo_search
+    duckduckgo_search.DDGS = FakeDDGS
+
+    import startup
+    with _service_output(args.verbose):
+        # Tek süreç: sentetik katalogun embedding'leri de ısınma sırasında tamamlanır
+        startup_report = startup.warm_up(build=True)
+    from rag import find_best_tool, find_tool_specific_answer
+
+    targets = {}
+    if "function" in args.target:
+        targets["function"] = lambda message, language, history, tool_name: (
+            find_tool_specific_answer(tool_name, message, language, history) if tool_name
+            else find_best_tool(message, language, history)
+        )
+    if "http" in args.target:
+        import logging
+        from werkzeug.serving import make_server
+        with _service_output(args.verbose):
+            from app import app
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        chat_url = f"http://127.0.0.1:{server.server_port}/api/chat"
+        targets["http"] = lambda message, language, history, tool_name: _post_chat(chat_url, {
+            "message": message, "language": language, "conversation_history": history, "tool_name": tool_name,
+        })
+
+    results = []
+    issued = 0
+    for target, call in targets.items():
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                requests = build_requests(scenario, args.warmup + args.requests, tools, args.distinct_queries,
+                                          f"{args.seed}:{target}:{concurrency}", issued)
+                issued += len(requests)
+                with _service_output(args.verbose):
+                    run_scenario(call, requests[:args.warmup], concurrency)
+                    before = upstream_counts(base_url)
+                    row = run_scenario(call, requests[args.warmup:], concurrency)
+                    after = upstream_counts(base_url)
+                current, peak = rss_mb()
+                row.update({
+                    "catalogue_size": size, "target": target, "scenario": scenario, "concurrency": concurrency,
+                    "rss_mb": current, "peak_rss_mb": peak,
+                    "upstream_calls_per_request": {
+                        name: (after.get(name, 0) - before.get(name, 0)) / max(1, row["requests"])
+                        for name in ("embeddings", "chat", "search")
+                    },
+                })
+                results.append(row)
+                print(f"→ {size} araç | {target:8} | {scenario:13} | c={concurrency:<3} "
+                      f"p50 {row['p50_ms'] or 0:7.1f} ms  p95 {row['p95_ms'] or 0:7.1f} ms  "
+                      f"p99 {row['p99_ms'] or 0:7.1f} ms  {row['throughput_rps'] or 0:7.1f} req/s  RSS {current or 0:.0f} MB")
+
+    upstream.terminate()
+    return {"catalogue_size": size, "startup": startup_report, "results": results}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _child_command(args, size: int, output: Path) -> list:
+    return [
+        sys.executable, str(Path(__file__).resolve()), "--tools", str(size), "--output", str(output),
+        "--scenarios", ",".join(args.scenarios), "--target", ",".join(args.target),
+        "--concurrency", ",".join(map(str, args.concurrency)), "--requests", str(args.requests),
+        "--warmup", str(args.warmup), "--distinct-queries", str(args.distinct_queries), "--seed", str(args.seed),
+        "--embedder", args.embedder, "--embedding-latency", str(args.embedding_latency),
+        "--chat-latency", str(args.chat_latency), "--search-latency", str(args.search_latency),
+    ] + (["--verbose"] if args.verbose else [])
+
+
+def run_benchmark(args) -> dict:
+    """Her katalog boyutunu ayrı süreçte çalıştırıp sonuçları tek bir raporda birleştirir"""
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "catalogues": [],
+    }
+    if len(args.tools) == 1:
+        report["catalogues"].append(run_catalogue(args, args.tools[0]))
+        return report
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.tools:
+            output = Path(tmp) / f"{size}.json"
+            subprocess.run(_child_command(args, size, output), check=True)
+            report["catalogues"].extend(json.loads(output.read_text(encoding="utf-8"))["catalogues"])
+    return report
+
+
+def compare_reports(base_path: str, new_path: str):
+    """İki rapordaki eşleşen senaryoların p50/p95/throughput farklarını yazdırır"""
+    def rows(path):
+        report = json.loads(Path(path).read_text(encoding="utf-8"))
+        return {(row["catalogue_size"], row["target"], row["scenario"], row["concurrency"]): row
+                for catalogue in report["catalogues"] for row in catalogue["results"]}
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+6.1f}%" if old and new is not None else "   n/a"
+
+    base, new = rows(base_path), rows(new_path)
+    for key in sorted(base.keys() & new.keys()):
+        old_row, new_row = base[key], new[key]
+        print(f"{key[0]:>6} araç | {key[1]:8} | {key[2]:13} | c={key[3]:<3} "
+              f"p50 {change(old_row['p50_ms'], new_row['p50_ms'])}  p95 {change(old_row['p95_ms'], new_row['p95_ms'])}  "
+              f"throughput {change(old_row['throughput_rps'], new_row['throughput_rps'])}")
+
+
+def _int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item]
+
+
+def _name_list(choices: tuple):
+    def parse(value: str) -> list:
+        names = [item for item in value.split(",") if item]
+        unknown = set(names) - set(choices)
+        if unknown:
+            raise argparse.ArgumentTypeError(f"bilinmeyen değer: {', '.join(sorted(unknown))}")
+        return names
+    return parse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="nlp_service benchmark / yük testi (sahte OpenAI ve arama sunucusuyla)")
+    parser.add_argument("--tools", type=_int_list, default=[15], help="katalog boyutları, ör. 15,1000,10000")
+    parser.add_argument("--scenarios", type=_name_list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--target", type=_name_list(TARGETS), default=["function"], help="function, http ya da ikisi")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=100, help="senaryo başına ölçülen istek sayısı")
+    parser.add_argument("--warmup", type=int, default=5, help="ölçüme katılmayan ısınma isteği sayısı")
+    parser.add_argument("--distinct-queries", type=int, default=0,
+                        help="0: her istek farklı (soğuk cache); N: sorgular N farklı metin arasında döner")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", default=os.getenv("EMBEDDER", "openai"))
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="sahte embedding gecikmesi (sn)")
+    parser.add_argument("--chat-latency", type=float, default=0.4, help="sahte chat completion gecikmesi (sn)")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="sahte web araması gecikmesi (sn)")
+    parser.add_argument("--verbose", action="store_true", help="servisin istek loglarını da göster")
+    parser.add_argument("--output", help="sonuçların yazılacağı JSON dosyası")
+    parser.add_argument("--compare", nargs=2, metavar=("ESKI", "YENI"), help="iki sonuç dosyasını karşılaştırır")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        sys.exit(0)
+
+    # Katalog geçici bir dizinde çalışır; çıktı yolu dizin değişmeden önce sabitlenir
+    if args.output:
+        args.output = str(Path(args.output).resolve())
+
+    report = run_benchmark(args)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ Sonuçlar kaydedildi: {args.output}")
@@ -0,0 +1,81 @@
+"""
+Araç kataloğu için toplu embedding kurulum komutu.
+
+    python build_index.py [--batch-size 256] [--concurrency 4]
+
+tools.json'daki araçların (ve intent örnek ifadelerinin) embedding metinlerini depoyla karşılaştırır,
+yalnızca eksik/değişmiş metinleri seçili embedder (EMBEDDER) için toplu isteklere böler, sınırlı paralellikle
+ve geri çekilmeli yeniden denemeyle gönderir. Sonuç tek bir yeni depo generation'ı olarak atomik
+yayınlanır; katalogda artık bulunmayan metinlerin (ör. düzenlenmiş bir aracın eski metni) vektörleri bu
+generation'a alınmaz, böylece depo katalog boyutunda kalır. Normalize araç matrisi worker'ların paylaşacağı
+tek bir .npy dosyası olarak yazılır; çalışan worker'lar manifest değişikliğini görüp yeni matrisi memory-map ile açar.
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# EMBEDDER gibi ayarlar aşağıdaki modüllerin import anında okunur
+load_dotenv()
+
+from embedders import get_embedder
+from embedding_store import embedding_key
+from intent_classifier import LABELLED_EXAMPLES
+from tool_index import EMBEDDING_MODEL, build_tool_index, embedding_text, get_embedding_store, load_tools, migrate_legacy_cache
+
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+
+def catalogue_texts(model: str = EMBEDDING_MODEL) -> dict:
+    """Depoda bulunması gereken tüm metinler: anahtar → metin"""
+    texts = [embedding_text(tool) for tool in load_tools()]
+    texts += [text for examples in LABELLED_EXAMPLES.values() for text in examples]
+    return {embedding_key(text, model): text for text in texts}
+
+
+def build_index(batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY, embedder=None) -> int:
+    """Eksik embedding'leri seçili backend ile toplu olarak üretip o modelin deposuna yayınlar; eklenen vektör sayısını döndürür"""
+    embedder = embedder or get_embedder()
+    model = embedder.model
+    store = get_embedding_store(model)
+    store.refresh()
+    migrate_legacy_cache(store, load_tools(), model)
+
+    texts = catalogue_texts(model)
+    missing = store.missing(texts)
+    # Katalogda artık bulunmayan metinlerin (ör. düzenlenmiş araçların eski metni) vektörleri
+    stale = len(store) - (len(texts) - len(missing))
+    if not missing and not stale:
+        print(f"✅ Embedding deposu güncel ({len(texts)} metin)")
+        return 0
+
+    started = time.perf_counter()
+    vectors = {}
+    if missing:
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        print(f"→ {len(missing)} embedding alınıyor ({model}, {len(batches)} istek, paralellik {concurrency})")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = pool.map(lambda keys: embedder.embed_batch([texts[key] for key in keys]), batches)
+            for keys, embeddings in zip(batches, results):
+                vectors.update(zip(keys, embeddings))
+
+    # Tüm vektörler tek bir yeni generation olarak atomik yayınlanır; yalnızca katalogdaki anahtarlar kalır
+    store.put_many(vectors, keep=texts)
+    print(f"✅ {len(vectors)} embedding {time.perf_counter() - started:.1f} sn'de eklendi, {stale} eski vektör atıldı "
+          f"(generation {store.generation})")
+
+    # Worker'ların paylaşacağı normalize araç matrisini de yayınla; çalışan worker'lar yeni
+    # generation'ı görünce matrisi yeniden hesaplamadan doğrudan memory-map ile açar
+    build_tool_index(model)
+    return len(vectors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Araç kataloğu embedding deposunu günceller")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    args = parser.parse_args()
+    build_index(batch_size=args.batch_size, concurrency=args.concurrency)
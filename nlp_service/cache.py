@@ -0,0 +1,340 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from text_utils import normalize_text
+
+
+def cache_key(text: str, model: str) -> str:
+    """Model adı + Türkçe'ye duyarlı normalize edilmiş metin"""
+    return f"{model}\n{normalize_text(text)}"
+
+
+class TTLCache:
+    """
+    LRU tahliyeli, kayıt başına TTL'li, sınırlı boyutlu cache.
+    path verilirse kayıtlar SQLite'a da yazılır; böylece yeniden başlatmalardan sonra
+    ve aynı dosyayı paylaşan worker'lar arasında kullanılabilir.
+    encode/decode: değerlerin SQLite'a yazılırken kullanılan dönüşümü (varsayılan JSON).
+    shared: True ise okumalar her zaman SQLite'tan yapılır; başka worker'ların güncellediği
+    kayıtların bayat bir bellek kopyası döndürülmez.
+    SQLite hataları (ör. "database is locked") isteği düşürmez: loglanır, errors sayacına yazılır ve
+    okuma kaçırma, yazma ise yalnızca belleğe yapılmış sayılır.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600, path: str = None, namespace: str = "default",
+                 encode=json.dumps, decode=json.loads, shared: bool = False):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.namespace = namespace
+        self.shared = bool(path) and shared
+        self._encode = encode
+        self._decode = decode
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._errors = 0
+        self._db = None
+        self._writes_since_trim = 0
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "namespace TEXT, key TEXT, value BLOB, expires_at REAL, stored_at REAL, "
+                    "PRIMARY KEY (namespace, key))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                # Dosya açılamazsa cache yalnızca bellekte çalışır
+                self._db_error("açma", e)
+                self._db = None
+                self.shared = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def persistent(self) -> bool:
+        """Kayıtlar SQLite'a da yazılıyorsa True; get/set disk G/Ç'si ve kilit beklemesi içerebilir"""
+        return self._db is not None
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            entry = None if self.shared else self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self._db_error("okuma", e)
+                    row = None
+                if row is not None and row[1] > now:
+                    value = self._decode(row[0])
+                    self._store(key, value, row[1])
+                    self._hits += 1
+                    return value
+
+            self._misses += 1
+            return default
+
+    def set(self, key: str, value, ttl: float = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._write_db(key, value, expires_at)
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._db_error("yazma", e)
+
+    def update(self, key: str, fn, default=None, ttl: float = None):
+        """
+        Okuma-değiştirme-yazma: fn(mevcut değer veya default) sonucunu yazar ve döndürür.
+        SQLite'ta tek bir BEGIN IMMEDIATE işleminde yapılır; aynı dosyayı paylaşan worker'ların
+        eşzamanlı güncellemeleri sıraya girer, biri diğerinin yazdığını ezmez.
+        """
+        with self._lock:
+            now = time.time()
+            expires_at = now + (self.ttl if ttl is None else ttl)
+            if self._db is not None:
+                try:
+                    self._db.execute("BEGIN IMMEDIATE")
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                    ).fetchone()
+                    value = fn(self._decode(row[0]) if row is not None and row[1] > now else default)
+                    self._write_db(key, value, expires_at)
+                    self._db.commit()
+                    self._store(key, value, expires_at)
+                    return value
+                except sqlite3.Error as e:
+                    # Güncelleme bu worker'ın bellek kopyası üzerinden yapılır; dosyaya yazılmaz
+                    self._db_error("güncelleme", e)
+                except BaseException:
+                    self._db.rollback()
+                    raise
+
+            entry = self._entries.get(key)
+            value = fn(entry[1] if entry is not None and entry[0] > now else default)
+            self._store(key, value, expires_at)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._db_error("silme", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._db_error("silme", e)
+
+    def _db_error(self, action: str, error: Exception):
+        """SQLite hatası: loglanır, sayılır ve açık işlem geri alınır; çağıran bellekle devam eder"""
+        self._errors += 1
+        print(f"⚠️ Cache ({self.namespace}) SQLite {action} hatası, atlanıyor: {error}")
+        if self._db is not None:
+            try:
+                self._db.rollback()
+            except sqlite3.Error:
+                pass
+
+    def _store(self, key: str, value, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _write_db(self, key: str, value, expires_at: float):
+        self._db.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, self._encode(value), expires_at, time.time()),
+        )
+        self._writes_since_trim += 1
+        if self._writes_since_trim >= 100:
+            self._trim_db()
+
+    def _trim_db(self):
+        """Süresi dolan ve boyut sınırını aşan en eski SQLite kayıtlarını siler"""
+        self._writes_since_trim = 0
+        self._db.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time()))
+        self._db.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key NOT IN "
+            "(SELECT key FROM cache WHERE namespace = ? ORDER BY stored_at DESC LIMIT ?)",
+            (self.namespace, self.namespace, self.max_size),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+                "evictions": self._evictions,
+                "errors": self._errors,
+            }
+
+
+class SemanticCache:
+    """
+    Anlamsal yanıt cache'i: yeni sorgunun embedding'i aynı dildeki daha önce yanıtlanmış bir sorguya
+    threshold'dan daha yakınsa saklanan yanıt döndürülür.
+    Her dil için sabit boyutlu bir matris tutulur; arama tek bir matris-vektör çarpımıdır.
+    Matris yalnızca ilk set() ile ayrılır ve en fazla max_languages dil tutulur (fazlası en eski dili atar).
+    generation (ör. araç indeksinin parmak izi) değiştiğinde o dilin tüm kayıtları geçersiz olur.
+    """
+
+    def __init__(self, max_size: int = 1000, threshold: float = 0.95, ttl: float = 3600, max_languages: int = 2):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_languages = max_languages
+        self._slots = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _language_slots(self, language: str, generation: str, dim: int, create: bool = True) -> dict:
+        slots = self._slots.get(language)
+        if slots is None or slots["generation"] != generation or slots["vectors"].shape[1] != dim:
+            if not create:
+                return None
+            self._slots.pop(language, None)
+            while len(self._slots) >= self.max_languages:
+                _, evicted = self._slots.popitem(last=False)
+                self._evictions += evicted["count"]
+            slots = {
+                "generation": generation,
+                "vectors": np.zeros((self.max_size, dim), dtype=np.float32),
+                "expires_at": np.zeros(self.max_size),
+                "last_used": np.zeros(self.max_size),
+                "responses": [None] * self.max_size,
+                "count": 0,
+            }
+            self._slots[language] = slots
+        return slots
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, query_vec, language: str, generation: str):
+        query = self._unit(query_vec)
+        now = time.time()
+        with self._lock:
+            slots = self._language_slots(language, generation, len(query), create=False)
+            count = slots["count"] if slots is not None else 0
+            if count:
+                scores = slots["vectors"][:count] @ query
+                scores[slots["expires_at"][:count] <= now] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    slots["last_used"][best] = now
+                    self._hits += 1
+                    return slots["responses"][best]
+            self._misses += 1
+            return None
+
+    def set(self, query_vec, language: str, generation: str, response: str):
+        query = self._unit(query_vec)
+        now = time.time()
+        with self._lock:
+            slots = self._language_slots(language, generation, len(query))
+            if slots["count"] < self.max_size:
+                slot = slots["count"]
+                slots["count"] += 1
+            else:
+                # Süresi dolmuş ya da en uzun süredir kullanılmayan kaydın yerine yaz
+                slot = int(np.argmin(np.where(slots["expires_at"] <= now, -1.0, slots["last_used"])))
+                self._evictions += 1
+            slots["vectors"][slot] = query
+            slots["expires_at"][slot] = now + self.ttl
+            slots["last_used"][slot] = now
+            slots["responses"][slot] = response
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": sum(slots["count"] for slots in self._slots.values()),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+class SingleFlight:
+    """
+    Aynı anahtar için eşzamanlı gelen çağrıları birleştirir: yalnızca ilk çağrı işi yapar,
+    diğerleri onun sonucunu (ya da hatasını) bekleyip paylaşır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn(*args, **kwargs)
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
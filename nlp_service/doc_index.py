@@ -0,0 +1,226 @@
+"""
+Araç bazlı soru-cevap için çevrimdışı doküman indeksi.
+
+Kurulum (istek sırasında değil, önceden):
+    python doc_index.py                 # tüm araçlar
+    python doc_index.py Consensus       # yalnızca belirtilen araçlar
+
+Kaynaklar: tools.json alanları + tool_docs/<slug>/ altındaki .md / .txt dosyaları.
+Çıktı: doc_index/<slug>/ altında araç başına bir FAISS indeksi (OpenAI dışı modellerde doc_index/<model>/<slug>/).
+Sorgu anında yalnızca yerel k-NN araması ve tek bir üretim çağrısı yapılır.
+langchain ve FAISS yalnızca bir indeks ilk kez kurulduğunda ya da yüklendiğinde import edilir;
+has_doc_index() ve yanıt biçimlendirme bunlara ihtiyaç duymaz.
+"""
+import os
+import sys
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# EMBEDDER gibi ayarlar aşağıdaki modüllerin import anında okunur
+load_dotenv()
+
+from embedders import get_embedder, model_dir
+from metrics import span
+from text_utils import tool_to_slug
+from tool_index import EMBEDDING_MODEL, load_tools
+from tool_scrapers import chat_completion, stream_chat_completion
+
+DOCS_DIR = Path("tool_docs")
+# Her embedding modelinin indeksi ayrıdır; OpenAI modeli eski yerinde kalır
+DOC_INDEX_DIR = model_dir(Path("doc_index"), EMBEDDING_MODEL)
+DOC_FILE_SUFFIXES = (".md", ".txt")
+EMBEDDING_BATCH_SIZE = int(os.getenv("DOC_EMBEDDING_BATCH_SIZE", "256"))
+DOC_SEARCH_K = 4
+DOC_ANSWER_MODEL = "gpt-3.5-turbo"
+DOC_ANSWER_MAX_TOKENS = 200
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+_embeddings_adapter = None
+
+
+def _embeddings():
+    """Seçili Embedder backend'ini FAISS'in beklediği langchain Embeddings arayüzüne uyarlar"""
+    global _embeddings_adapter
+    if _embeddings_adapter is None:
+        from langchain_core.embeddings import Embeddings
+
+        class EmbedderEmbeddings(Embeddings):
+
+            def __init__(self, embedder, batch_size: int = EMBEDDING_BATCH_SIZE):
+                self.embedder = embedder
+                self.batch_size = batch_size
+
+            def embed_documents(self, texts: list) -> list:
+                vectors = []
+                for i in range(0, len(texts), self.batch_size):
+                    vectors.extend(self.embedder.embed_batch(texts[i:i + self.batch_size]).tolist())
+                return vectors
+
+            def embed_query(self, text: str) -> list:
+                return self.embedder.embed(text).tolist()
+
+        _embeddings_adapter = EmbedderEmbeddings(get_embedder())
+    return _embeddings_adapter
+
+
+def tool_documents(tool: dict) -> list:
+    """Bir aracın tools.json alanlarından ve yerel doküman dosyalarından Document listesi üretir"""
+    from langchain_core.documents import Document
+
+    name = tool["tool"]
+    catalogue_text = "\n".join([
+        f"{name}: {tool['use']}",
+        f"Akademik kullanım: {tool['academic_use']}",
+        f"Academic use: {tool.get('academic_use_en', '')}",
+        f"Nasıl kullanılır: {tool['how_to']}",
+        f"How to use: {tool.get('how_to_en', '')}",
+        f"Keywords: {', '.join(tool['keywords'])}",
+        f"Official site: {tool['link']}",
+    ])
+    documents = [Document(page_content=catalogue_text, metadata={"tool": name, "source": "tools.json"})]
+
+    tool_docs_dir = DOCS_DIR / tool_to_slug(name)
+    if tool_docs_dir.is_dir():
+        for doc_path in sorted(tool_docs_dir.rglob("*")):
+            if doc_path.suffix.lower() in DOC_FILE_SUFFIXES:
+                documents.append(Document(
+                    page_content=doc_path.read_text(encoding="utf-8"),
+                    metadata={"tool": name, "source": str(doc_path)},
+                ))
+    return documents
+
+
+def build_doc_indexes(tool_names: list = None) -> dict:
+    """
+    Seçilen araçların dokümanlarını parçalara böler, tüm parçaların embedding'ini
+    toplu (batch) isteklerle tek seferde alır ve her araç için ayrı bir FAISS indeksi kaydeder.
+    Returns: {araç adı: parça sayısı}
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.vectorstores import FAISS
+
+    tools = load_tools()
+    if tool_names:
+        tools = [tool for tool in tools if tool["tool"] in tool_names]
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    chunks_by_tool = {tool["tool"]: splitter.split_documents(tool_documents(tool)) for tool in tools}
+    all_chunks = [chunk for chunks in chunks_by_tool.values() for chunk in chunks]
+    if not all_chunks:
+        return {}
+
+    embeddings = _embeddings()
+    print(f"→ {len(all_chunks)} doküman parçası için embedding alınıyor ({len(tools)} araç)")
+    vectors = embeddings.embed_documents([chunk.page_content for chunk in all_chunks])
+
+    offset = 0
+    built = {}
+    for name, chunks in chunks_by_tool.items():
+        tool_vectors = vectors[offset:offset + len(chunks)]
+        offset += len(chunks)
+        store = FAISS.from_embeddings(
+            [(chunk.page_content, vector) for chunk, vector in zip(chunks, tool_vectors)],
+            embeddings,
+            metadatas=[chunk.metadata for chunk in chunks],
+        )
+        store.save_local(str(DOC_INDEX_DIR / tool_to_slug(name)))
+        built[name] = len(chunks)
+        print(f"✅ {name}: {len(chunks)} parça indekslendi")
+    return built
+
+
+def _index_path(tool_name: str) -> Path:
+    return DOC_INDEX_DIR / tool_to_slug(tool_name)
+
+
+def has_doc_index(tool_name: str) -> bool:
+    return (_index_path(tool_name) / "index.faiss").exists()
+
+
+def load_doc_index(tool_name: str):
+    """Aracın FAISS indeksini bellekte tutar; indeks yeniden kurulduysa tekrar yükler"""
+    from langchain_community.vectorstores import FAISS
+
+    index_path = _index_path(tool_name)
+    mtime = (index_path / "index.faiss").stat().st_mtime_ns
+    with _loaded_lock:
+        loaded = _loaded.get(tool_name)
+        if loaded is None or loaded[0] != mtime:
+            store = FAISS.load_local(str(index_path), _embeddings(), allow_dangerous_deserialization=True)
+            loaded = (mtime, store)
+            _loaded[tool_name] = loaded
+        return loaded[1]
+
+
+def build_doc_prompt(tool_name: str, question: str, query_embedding, language: str = "tr") -> str:
+    """Yerel indeksten en ilgili parçaları bulup üretim prompt'unu hazırlar"""
+    with span("index_load"):
+        store = load_doc_index(tool_name)
+    with span("scoring"):
+        documents = store.similarity_search_by_vector(list(map(float, query_embedding)), k=DOC_SEARCH_K)
+    context = "\n\n".join(doc.page_content for doc in documents)
+
+    if language == "en":
+        prompt = f"""Based on the following documentation about {tool_name}, provide a short, clear and helpful answer to the user's question: "{question}"
+
+Documentation:
+{context}
+
+Requirements:
+- Keep the answer short and concise (max 3-4 sentences)
+- Focus specifically on {tool_name}
+- Only use the documentation above
+- If the documentation doesn't cover the question, say so briefly
+
+Answer:"""
+    else:
+        prompt = f"""Aşağıdaki {tool_name} dokümantasyonuna dayanarak, kullanıcının sorusuna kısa, net ve yardımcı bir yanıt verin: "{question}"
+
+Dokümantasyon:
+{context}
+
+Gereksinimler:
+- Yanıtı kısa ve öz tutun (maksimum 3-4 cümle)
+- Özellikle {tool_name} aracına odaklanın
+- Yalnızca yukarıdaki dokümantasyonu kullanın
+- Dokümantasyon soruyu kapsamıyorsa bunu kısaca belirtin
+
+Yanıt:"""
+    return prompt
+
+
+def format_doc_answer(answer: str, language: str = "tr", official_link: str = "") -> str:
+    if not official_link:
+        return answer
+    if language == "en":
+        return f"""{answer}
+
+🌐 **Official site:** {official_link}"""
+    return f"""{answer}
+
+🌐 **Resmi site:** {official_link}"""
+
+
+def get_tool_doc_answer(tool_name: str, question: str, query_embedding, language: str = "tr", official_link: str = "") -> str:
+    """Yerel indeksten en ilgili parçaları bulur ve tek bir ChatGPT çağrısıyla yanıt üretir"""
+    prompt = build_doc_prompt(tool_name, question, query_embedding, language)
+    with span("summarization"):
+        answer = chat_completion(prompt, DOC_ANSWER_MODEL, temperature=0.1, max_tokens=DOC_ANSWER_MAX_TOKENS)
+    return format_doc_answer(answer.strip(), language, official_link)
+
+
+def stream_tool_doc_answer(tool_name: str, question: str, query_embedding, language: str = "tr", official_link: str = ""):
+    """get_tool_doc_answer'ın akışlı karşılığı: token'lar geldikçe, ardından resmi site satırı yield edilir"""
+    prompt = build_doc_prompt(tool_name, question, query_embedding, language)
+    yield from stream_chat_completion(prompt, DOC_ANSWER_MODEL, temperature=0.1, max_tokens=DOC_ANSWER_MAX_TOKENS)
+    # Boş yanıtın biçimlendirilmiş hali yalnızca resmi site satırıdır
+    footer = format_doc_answer("", language, official_link)
+    if footer:
+        yield footer
+
+
+if __name__ == "__main__":
+    build_doc_indexes(sys.argv[1:] or None)
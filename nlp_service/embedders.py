@@ -0,0 +1,166 @@
+"""
+Değiştirilebilir embedding backend'leri; EMBEDDER ortam değişkeniyle seçilir:
+    openai  → text-embedding-ada-002 (varsayılan; her sorgu bir ağ isteği)
+    local   → hash'lenmiş karakter n-gram modeli (CPU, ağ yok, sorgu başına milisaniyenin altında)
+
+Her backend'in model adı farklıdır. Depo anahtarları, sorgu cache'leri, embedding deposu dizini ve
+araç indeksi generation'ı model adına bağlı olduğundan backend'ler birbirinin vektörlerini görmez.
+"""
+import os
+import math
+import time
+import zlib
+import random
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from collections import Counter
+
+import numpy as np
+import openai
+
+from metrics import count_openai_call
+from resilience import RETRYABLE_ERRORS, get_upstream
+from text_utils import tokenize, tool_to_slug
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDER = os.getenv("EMBEDDER", "openai")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "1024"))
+MAX_RETRIES = 5
+
+
+def model_dir(base: Path, model: str) -> Path:
+    """Modele ait dosyaların dizini; OpenAI modeli eski yerinde kalır, diğerleri alt dizin kullanır"""
+    base = Path(base)
+    return base if model == OPENAI_EMBEDDING_MODEL else base / tool_to_slug(model)
+
+
+class Embedder(ABC):
+    """
+    Embedding backend arayüzü.
+    model: depo anahtarlarında ve cache'lerde kullanılan ad
+    remote: True ise her çağrı bir ağ isteğidir; sonuçları cache'lemeye ve sınırlamaya değer
+    Cosine dağılımı modele göre değiştiğinden benzerlik eşikleri de backend'e aittir:
+    min_similarity: bir aracın öneri olarak kabul edilmesi için gereken minimum benzerlik
+    intent_threshold, intent_margin: intent centroid eşleşmesi için minimum benzerlik ve ikinci etikete göre fark
+    semantic_cache_threshold: anlamsal yanıt cache'inde iki sorgunun aynı sayılması için gereken benzerlik
+    """
+
+    model = None
+    remote = True
+    min_similarity = 0.75
+    intent_threshold = 0.9
+    intent_margin = 0.02
+    semantic_cache_threshold = 0.95
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    @abstractmethod
+    def embed_batch(self, texts: list) -> np.ndarray:
+        """Metinlerin embedding'lerini aynı sırada, satır başına bir float32 vektör olarak döndürür"""
+
+
+class OpenAIEmbedder(Embedder):
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, client=None, max_retries: int = MAX_RETRIES):
+        self.model = model
+        self.max_retries = max_retries
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> openai.OpenAI:
+        # Client ilk embedding isteğinde kurulur; API anahtarı olmadan import edilebilir
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def embed(self, text: str) -> np.ndarray:
+        """İstek yolundaki tek sorgu: hız sınırı, deadline'lı yeniden deneme ve devre kesici resilience.py'den gelir"""
+        def create(timeout):
+            return self.client.with_options(timeout=timeout, max_retries=0).embeddings.create(model=self.model, input=text)
+
+        response = get_upstream("embedding").call(self.model, create, key=text)
+        count_openai_call("embedding", self.model, response.usage)
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+    def embed_batch(self, texts: list) -> np.ndarray:
+        """Tek istekte birden fazla metnin embedding'ini alır; geçici hatalarda jitter'lı üstel bekleme ile yeniden dener"""
+        client = self.client.with_options(max_retries=0)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.embeddings.create(model=self.model, input=texts)
+                count_openai_call("embedding", self.model, response.usage)
+                return np.asarray([item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+                                  dtype=np.float32)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"⚠️ Embedding isteği başarısız ({e.__class__.__name__}); {delay:.1f} sn sonra tekrar denenecek")
+                time.sleep(delay)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Yerel, eğitimsiz karakter n-gram modeli. Her kelime boşluklarla çevrelenip n-gram'larına ayrılır
+    (Türkçe ekler n-gram'ların çoğunu değiştirmez), n-gram'lar işaretli hash ile sabit boyutlu bir
+    vektöre yazılır ve log ile sönümlenen frekanslarla ağırlıklandırılır. Sözlük ya da model dosyası gerekmez.
+    """
+
+    remote = False
+    # İlgisiz sorgular ~0.05, ilgili sorgular 0.3+ benzerlik alır
+    min_similarity = 0.2
+    # Etiketli örneklerin kendileri centroid'lerine 0.3-0.65 benzerlik alır, dışarıda bırakılan örnekler ise
+    # 0.55'in altında ve sık sık yanlış etikete düşer: yalnızca örneklere çok yakın mesajlar kabul edilir
+    intent_threshold = 0.55
+    intent_margin = 0.15
+    # Ek/dolgu kelimesi farkı 0.92-0.94, konusu değişen sorgular ("sunum" → "quiz" aracı) en çok ~0.81 alır
+    semantic_cache_threshold = 0.9
+
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM, ngram_range: tuple = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.model = f"local-char{ngram_range[0]}-{ngram_range[1]}-hash{dim}"
+
+    def _features(self, text: str) -> Counter:
+        features = Counter()
+        for word in tokenize(text):
+            features[word] += 1
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for i in range(len(padded) - n + 1):
+                    features[padded[i:i + n]] += 1
+        return features
+
+    def embed_batch(self, texts: list) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dim] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+EMBEDDERS = {
+    "openai": OpenAIEmbedder,
+    "local": HashingEmbedder,
+}
+
+_embedder = None
+
+
+def get_embedder() -> Embedder:
+    """EMBEDDER ortam değişkeniyle seçilen süreç genelindeki backend"""
+    global _embedder
+    if _embedder is None:
+        if EMBEDDER not in EMBEDDERS:
+            raise ValueError(f"Bilinmeyen EMBEDDER: {EMBEDDER} (seçenekler: {', '.join(EMBEDDERS)})")
+        _embedder = EMBEDDERS[EMBEDDER]()
+    return _embedder
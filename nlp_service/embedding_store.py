@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+STORE_DIR = Path("embedding_store")
+MANIFEST_NAME = "manifest.json"
+STORE_VERSION = 1
+
+
+def embedding_key(text: str, model: str) -> str:
+    """Embedding anahtarı: model adı + embedding'i alınan metnin birebir hash'i"""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _write_text_atomic(path: Path, data: str):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(data, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _write_npy_atomic(path: Path, matrix: np.ndarray):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingStore:
+    """
+    Binary, içerik adresli embedding deposu.
+    embedding_store/
+        manifest.json          → {"generation", "vectors", "dim", "keys": {anahtar: satır}}
+        vectors-<gen>.npy      → float32 matris, memory-map ile kopyasız açılır
+    Her yazım yeni bir generation dosyası üretir ve manifest en son, tek adımda değiştirilir;
+    böylece okuyucular hiçbir zaman yarım yazılmış bir matris görmez.
+    """
+
+    def __init__(self, path: Path = STORE_DIR):
+        self.path = Path(path)
+        self.manifest_path = self.path / MANIFEST_NAME
+        self._lock = threading.Lock()
+        self._stamp = None
+        # (generation, anahtar → satır, matris) tek bir atamayla değişir
+        self._state = (None, {}, None)
+        self.refresh()
+
+    @property
+    def generation(self):
+        return self._state[0]
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._state[1]
+
+    def refresh(self) -> bool:
+        """Manifest değiştiyse (başka bir süreç yazdıysa) yeni generation'ı açar"""
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        vectors = np.load(self.path / manifest["vectors"], mmap_mode="r")
+        self._state = (manifest["generation"], manifest["keys"], vectors)
+        self._stamp = stamp
+        return True
+
+    def get(self, key: str):
+        """Anahtarın vektörünü (salt okunur, memory-mapped satır) döndürür; yoksa None"""
+        _, key_rows, vectors = self._state
+        row = key_rows.get(key)
+        return None if row is None else vectors[row]
+
+    def get_many(self, keys: list):
+        """Tüm anahtarlar depodaysa satırları tek bir matris olarak döndürür, değilse None"""
+        _, key_rows, vectors = self._state
+        rows = [key_rows.get(key) for key in keys]
+        if not rows or any(row is None for row in rows):
+            return None
+        return vectors[rows]
+
+    def missing(self, keys) -> list:
+        key_rows = self._state[1]
+        return [key for key in keys if key not in key_rows]
+
+    def put_many(self, items: dict, keep=None):
+        """
+        anahtar → vektör çiftlerini ekler ve yeni bir generation yayınlar.
+        keep verilirse (ör. kataloğun güncel anahtarları) bu kümede olmayan satırlar aynı generation'da atılır;
+        böylece metni değişen araçların eski vektörleri matriste ve manifest'te birikmez.
+        """
+        with self._lock:
+            self.refresh()
+            previous, key_rows, vectors = self._state
+            kept = key_rows if keep is None else {key: row for key, row in key_rows.items() if key in keep}
+            added = {key: vector for key, vector in items.items() if key not in kept}
+            if not added and len(kept) == len(key_rows):
+                return
+
+            if len(kept) == len(key_rows):
+                keys = dict(key_rows)
+                base = vectors
+            else:
+                # Kalan satırlar sıkıştırılarak yeni matrise kopyalanır
+                keys = {key: row for row, key in enumerate(kept)}
+                base = vectors[list(kept.values())]
+            for key in added:
+                keys[key] = len(keys)
+
+            parts = ([] if base is None else [base]) + [np.asarray(vector, dtype=np.float32)[None] for vector in added.values()]
+            matrix = np.concatenate(parts)
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            generation = hashlib.sha256(f"{previous}:{sorted(keys)}".encode("utf-8")).hexdigest()[:16]
+            vectors_name = f"vectors-{generation}.npy"
+            _write_npy_atomic(self.path / vectors_name, matrix)
+
+            manifest = {
+                "version": STORE_VERSION,
+                "generation": generation,
+                "vectors": vectors_name,
+                "dim": int(matrix.shape[1]),
+                "keys": keys,
+            }
+            _write_text_atomic(self.manifest_path, json.dumps(manifest))
+            self.refresh()
+            self._remove_stale_generations(keep={generation, previous})
+
+    def _remove_stale_generations(self, keep: set):
+        """Güncel ve bir önceki generation dışındaki eski matris dosyalarını siler"""
+        for vectors_path in self.path.glob("vectors-*.npy"):
+            if vectors_path.stem.split("-", 1)[1] not in keep:
+                try:
+                    vectors_path.unlink()
+                except OSError:
+                    pass
+
+    def migrate_json_cache(self, cache_path: Path, texts_by_name: dict, model: str) -> int:
+        """
+        Eski embedding_cache.json (araç adı → vektör) dosyasını tek seferlik depoya taşır.
+        Vektörler, aracın şu anki embedding metniyle anahtarlanır.
+        """
+        cache_path = Path(cache_path)
+        if not cache_path.exists():
+            return 0
+
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        items = {
+            embedding_key(text, model): cache[name]
+            for name, text in texts_by_name.items()
+            if name in cache
+        }
+        self.put_many(items)
+        print(f"📦 {len(items)} embedding {cache_path} dosyasından depoya taşındı")
+        return len(items)
+
+
+if __name__ == "__main__":
+    # Tek seferlik göç: python embedding_store.py
+    from tool_index import CACHE_PATH, EMBEDDING_MODEL, embedding_text, load_tools
+
+    tools = load_tools()
+    store = EmbeddingStore()
+    store.migrate_json_cache(CACHE_PATH, {tool["tool"]: embedding_text(tool) for tool in tools}, EMBEDDING_MODEL)
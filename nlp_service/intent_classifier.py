@@ -0,0 +1,233 @@
+import os
+import threading
+
+import numpy as np
+
+from embedders import get_embedder
+from text_utils import tokenize
+from embedding_store import embedding_key
+from tool_index import EMBEDDING_MODEL, get_embedding_store, get_tool_index
+
+# Centroid eşleşmesinin kabul edilmesi için gereken minimum benzerlik ve ikinci etikete göre fark
+# (verilmezse seçili embedding backend'ine göre kalibre edilmiş değerler kullanılır)
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD") or get_embedder().intent_threshold)
+INTENT_CONFIDENCE_MARGIN = float(os.getenv("INTENT_CONFIDENCE_MARGIN") or get_embedder().intent_margin)
+
+# Kural katmanı sözlükleri (tokenize() çıktısıyla karşılaştırıldığı için ASCII'ye katlanmış yazılır)
+_GREETING_WORDS = {
+    "merhaba", "merhabalar", "selam", "selamlar", "slm", "mrb", "hello", "hi", "hey",
+    "gunaydin", "gunler", "aksamlar", "geceler", "morning", "evening", "afternoon", "naber", "aleykum",
+}
+_GREETING_FILLER = {"iyi", "good", "nasilsin", "nasilsiniz", "selamun", "there", "hocam", "dostum"}
+_THANKS_WORDS = {"sagol", "sagolun", "sagolasin", "eyvallah", "tsk", "tskler", "tsklr", "thanks", "thank", "thx", "mersi"}
+_THANKS_FILLER = {
+    "cok", "ederim", "ederiz", "you", "a", "lot", "so", "much", "very", "yardimci", "oldun", "oldunuz",
+    "harika", "super", "tamam", "ok", "anladim", "great", "guzel", "isime", "yaradi", "for", "help", "the",
+}
+_ALTERNATIVE_WORDS = {"baska", "alternatif", "alternatifi", "alternatifler", "alternative", "alternatives", "another", "else", "other", "farkli"}
+_GRAMMAR_PREFIXES = ("gramer", "grammar", "dilbilgisi", "imla", "spelling")
+_GRAMMAR_PHRASES = ("dil kontrol", "yazim hata", "yazim kontrol")
+_GRAMMAR_WORDS = {"dil", "yazim"}
+_REFERENCE_PREFIXES = ("referans", "kaynakca", "atif", "citation", "reference")
+# Takip sorusu kurallarında konu kelimelerinin yanında bulunabilecek dolgu kelimeleri (ve ek almış gövdeleri);
+# bunların dışında bir kelime ("quiz", bir araç adı, ...) varsa mesaj yeni bir sorudur ve kurallar karar vermez
+_FOLLOW_UP_FILLER = {
+    "peki", "ya", "bir", "bi", "var", "mi", "mu", "ne", "neler", "icin", "misin", "misiniz", "etmek", "daha",
+    "what", "about", "and", "for", "any", "is", "there", "do", "you", "me", "the", "a", "an", "my", "options", "option",
+    "recommend", "suggest", "tool", "tools",
+}
+_FOLLOW_UP_STEMS = ("oner", "arac", "secenek", "kullan", "kontrol", "duzelt", "hata", "makale", "check")
+
+# Centroid katmanı için etiketli örnek ifadeler: (intent, request_type) → örnekler
+LABELLED_EXAMPLES = {
+    ("SELAM", "new_topic"): [
+        "merhaba", "selam", "merhabalar nasılsın", "günaydın", "iyi günler", "hello", "hi there", "hey, good morning",
+    ],
+    ("TEŞEKKÜR", "new_topic"): [
+        "teşekkürler", "çok teşekkür ederim", "sağol", "eyvallah çok işime yaradı", "teşekkürler çok yardımcı oldun",
+        "thank you", "thanks a lot", "thanks, that was helpful",
+    ],
+    ("SORU", "new_topic"): [
+        "sunum hazırlamak için araç", "makale özeti çıkarmak istiyorum", "literatür taraması için ne kullanabilirim",
+        "quiz hazırlamak için hangi aracı kullanayım", "ders videosu hazırlamak istiyorum", "ders planı oluşturmak istiyorum",
+        "I need a tool for presentations", "which tool summarizes research papers", "how can I create quiz questions",
+    ],
+    ("TAKIP_SORU", "alternative"): [
+        "peki başka", "başka ne önerirsin", "başka bir alternatif var mı", "farklı bir araç önerir misin",
+        "any other options", "what else do you recommend", "is there another alternative",
+    ],
+    ("TAKIP_SORU", "grammar"): [
+        "peki dil kontrolü için", "dilbilgisi kontrolü için ne önerirsin", "yazım hatalarımı düzeltmek için",
+        "what about grammar checking", "and for grammar and spelling",
+    ],
+    ("TAKIP_SORU", "reference"): [
+        "makalede referansların kontrolü için", "kaynakça kontrolü için ne kullanayım", "peki atıfları kontrol etmek için",
+        "what about checking references", "and for citation checking",
+    ],
+}
+
+def _result(intent: str, request_type: str, confidence: float, source: str) -> dict:
+    return {"intent": intent, "request_type": request_type, "confidence": round(confidence, 3), "source": source}
+
+
+def _only_filler(tokens: list, is_topic_word) -> bool:
+    """Mesajda konu kelimeleri ve dolgu kelimeleri dışında bir içerik kelimesi yoksa True"""
+    return all(
+        is_topic_word(token) or token in _FOLLOW_UP_FILLER or token.startswith(_FOLLOW_UP_STEMS) for token in tokens
+    )
+
+
+def classify_rules(message: str, conversation_history: list = None) -> dict:
+    """Kalıp kurallarıyla kesin sınıflandırma; emin değilse None döndürür"""
+    tokens = tokenize(message)
+    if not tokens:
+        return None
+
+    token_set = set(tokens)
+    if len(tokens) <= 5 and token_set & _GREETING_WORDS and token_set <= _GREETING_WORDS | _GREETING_FILLER:
+        return _result("SELAM", "new_topic", 0.95, "rules")
+
+    has_thanks = any(token.startswith("tesekkur") or token in _THANKS_WORDS for token in tokens)
+    if len(tokens) <= 8 and has_thanks and all(
+        token.startswith("tesekkur") or token in _THANKS_WORDS | _THANKS_FILLER for token in tokens
+    ):
+        return _result("TEŞEKKÜR", "new_topic", 0.95, "rules")
+
+    # Takip soruları ancak konuşmada daha önce bir araç önerildiyse anlamlıdır
+    # (istemci ilk mesajda da karşılama mesajını geçmiş olarak gönderir)
+    index = get_tool_index()
+    if index.last_recommended(conversation_history) is None:
+        return None
+
+    # Bir aracın adını anan mesaj ("Grammarly nedir" → "grammar" öneki) takip kuralına uymaz
+    if token_set & index.name_tokens:
+        return None
+
+    joined = " ".join(tokens)
+    if len(tokens) <= 6 and token_set & _ALTERNATIVE_WORDS and _only_filler(tokens, lambda token: token in _ALTERNATIVE_WORDS):
+        return _result("TAKIP_SORU", "alternative", 0.9, "rules")
+    if len(tokens) <= 7 and (
+        any(token.startswith(_GRAMMAR_PREFIXES) for token in tokens) or any(p in joined for p in _GRAMMAR_PHRASES)
+    ) and _only_filler(tokens, lambda token: token.startswith(_GRAMMAR_PREFIXES) or token in _GRAMMAR_WORDS):
+        return _result("TAKIP_SORU", "grammar", 0.9, "rules")
+    if len(tokens) <= 7 and any(token.startswith(_REFERENCE_PREFIXES) for token in tokens) and _only_filler(
+        tokens, lambda token: token.startswith(_REFERENCE_PREFIXES)
+    ):
+        return _result("TAKIP_SORU", "reference", 0.9, "rules")
+
+    return None
+
+
+class IntentClassifier:
+    """
+    LLM'in önündeki yerel intent katmanı.
+    1) Kalıp kuralları, 2) etiketli örneklerin embedding centroid'lerine en yakın komşu.
+    Güven eşiğinin altında kalan mesajlar için None döner; çağıran LLM'e yükseltir.
+    """
+
+    def __init__(self, model: str = EMBEDDING_MODEL,
+                 threshold: float = INTENT_CONFIDENCE_THRESHOLD, margin: float = INTENT_CONFIDENCE_MARGIN):
+        self.model = model
+        self.threshold = threshold
+        self.margin = margin
+        self._labels = list(LABELLED_EXAMPLES)
+        self._centroids = None
+        # Örnek vektörleri eksik bulunan depo generation'ı; depo değişmedikçe yeniden denenmez
+        self._missing_generation = None
+        self._prepare_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"rule_hits": 0, "centroid_hits": 0, "misses": 0}
+
+    def prepare(self) -> bool:
+        """
+        Örnek ifadelerin embedding'lerini depodan okuyup centroid matrisini kurar; hiçbir API çağrısı yapmaz.
+        Vektörler build_index.py ile LABELLED_EXAMPLES için üretilir; eksikse centroid katmanı kapalı kalır
+        (False döner) ve depo yeni bir generation yayınlayınca yeniden denenir.
+        """
+        store = get_embedding_store(self.model)
+        if self._centroids is not None:
+            return True
+        if store.generation == self._missing_generation:
+            return False
+
+        with self._prepare_lock:
+            if self._centroids is not None:
+                return True
+            generation = store.generation
+            examples = [(label, text) for label in self._labels for text in LABELLED_EXAMPLES[label]]
+            keys = [embedding_key(text, self.model) for _, text in examples]
+            vectors = store.get_many(keys)
+            if vectors is None:
+                if generation != self._missing_generation:
+                    print(f"⚠️ {len(set(store.missing(keys)))} intent örneğinin embedding'i yok; centroid katmanı "
+                          "kapalı ('python build_index.py' çalıştırın)")
+                self._missing_generation = generation
+                return False
+
+            vectors = np.asarray(vectors, dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            label_ids = np.array([self._labels.index(label) for label, _ in examples])
+            centroids = np.stack([vectors[label_ids == i].mean(axis=0) for i in range(len(self._labels))])
+            self._centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+            return True
+
+    def classify_embedding(self, query_vec, conversation_history: list = None) -> dict:
+        """Sorgu embedding'ini en yakın centroid'e atar; güven düşükse ya da centroid'ler hazır değilse None döndürür"""
+        if not self.prepare():
+            return None
+
+        query = np.asarray(query_vec, dtype=np.float32)
+        scores = self._centroids @ (query / np.linalg.norm(query))
+        first, second = np.argsort(-scores)[:2]
+        confidence = float(scores[first])
+        if confidence < self.threshold or confidence - float(scores[second]) < self.margin:
+            return None
+
+        intent, request_type = self._labels[first]
+        if intent == "TAKIP_SORU" and get_tool_index().last_recommended(conversation_history) is None:
+            # Daha önce araç önerilmediyse dil/referans isteği yeni bir sorudur; "başka" ise belirsizdir
+            if request_type == "alternative":
+                return None
+            intent, request_type = "SORU", "new_topic"
+        return _result(intent, request_type, confidence, "centroid")
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            self._stats[counter] += 1
+
+    def match_rules(self, message: str, conversation_history: list = None) -> dict:
+        """Yalnızca kural katmanı; embedding gerektirmez. İsabette sayaç artar, ıskalama sayılmaz."""
+        result = classify_rules(message, conversation_history)
+        if result is not None:
+            self._count("rule_hits")
+        return result
+
+    def classify(self, message: str, conversation_history: list = None, get_query_embedding=None) -> dict:
+        """
+        Önce kurallar, sonra (embedding verilmişse) centroid eşleşmesi.
+        Hiçbiri yeterince emin değilse None döndürür ve miss sayacını artırır.
+        """
+        result = self.match_rules(message, conversation_history)
+        if result is not None:
+            return result
+        return self.match_centroid(get_query_embedding, conversation_history)
+
+    def match_centroid(self, get_query_embedding, conversation_history: list = None) -> dict:
+        """Yalnızca centroid katmanı (kurallar önceden denenmiş olmalı); isabet ya da miss sayacı artar"""
+        result = None
+        if get_query_embedding is not None:
+            try:
+                result = self.classify_embedding(get_query_embedding(), conversation_history)
+            except Exception as e:
+                print(f"❌ Yerel intent sınıflandırma hatası: {e}")
+
+        self._count("misses" if result is None else "centroid_hits")
+        return result
+
+    def stats(self) -> dict:
+        """Kural/centroid isabet ve LLM'e yükseltme sayaçları"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total = sum(stats.values())
+        stats["hit_rate"] = round((stats["rule_hits"] + stats["centroid_hits"]) / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,146 @@
+"""
+tools.json alanları üzerinde yerel BM25 ters indeksi (inverted index).
+
+Terimler tokenize() ile Türkçe'ye duyarlı küçük harfe çevrilip ASCII'ye katlanır ve ilk
+STEM_LENGTH karaktere kısaltılır (Türkçe ekleri için basit önek gövdeleme: "sunumlar" → "sunum").
+Her terimin araç başına BM25 katkısı indeks kurulurken hesaplanır; sorgu anında yalnızca
+sorgu terimlerinin posting listeleri toplanır, hiçbir API çağrısı yapılmaz.
+"""
+import os
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from text_utils import tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+STEM_LENGTH = 5
+# Küratörlü anahtar kelimeler ve araç adı, serbest açıklama metninden daha güçlü sinyaldir
+FIELD_WEIGHTS = {"tool": 3.0, "keywords": 2.0, "use": 1.0, "academic_use": 1.0, "academic_use_en": 1.0}
+
+# En iyi aracın BM25 skoru ikinciden en az bu kat yüksekse sözcük eşleşmesi kesin sayılır
+LEXICAL_DECISIVE_MARGIN = float(os.getenv("LEXICAL_DECISIVE_MARGIN", "1.5"))
+# Hibrit skor: cosine + LEXICAL_WEIGHT * bm25 / (bm25 + LEXICAL_SATURATION)
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "0.15"))
+LEXICAL_SATURATION = 5.0
+
+
+def lexical_terms(text: str) -> list:
+    return [token[:STEM_LENGTH] for token in tokenize(text)]
+
+
+def _field_text(value) -> str:
+    return " ".join(value) if isinstance(value, list) else (value or "")
+
+
+class LexicalIndex:
+    """
+    tools: tools.json kayıtları; skorlar bu listeyle aynı sıradadır.
+    Ayrıca araç adları ve anahtar kelime ifadelerinin birebir geçişini bulmak için ilk kelimeye göre bir ifade indeksi tutar.
+    """
+
+    def __init__(self, tools: list):
+        self.tools = tools
+        frequencies = []
+        for tool in tools:
+            tf = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in lexical_terms(_field_text(tool.get(field))):
+                    tf[term] += weight
+            frequencies.append(tf)
+
+        lengths = [sum(tf.values()) for tf in frequencies]
+        avg_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        postings = defaultdict(list)
+        for doc_id, tf in enumerate(frequencies):
+            for term, freq in tf.items():
+                postings[term].append((doc_id, freq))
+
+        # terim → (araç sırası dizisi, BM25 katkısı dizisi)
+        self._postings = {}
+        for term, docs in postings.items():
+            idf = math.log(1 + (len(tools) - len(docs) + 0.5) / (len(docs) + 0.5))
+            doc_ids = np.array([doc_id for doc_id, _ in docs], dtype=np.int64)
+            contributions = np.array([
+                idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length))
+                for doc_id, freq in docs
+            ], dtype=np.float32)
+            self._postings[term] = (doc_ids, contributions)
+
+        # Birebir geçişler: her ifade kelimesi sorguda aynı sırayla, yalnızca ek almış olarak geçebilir
+        # ("literatür taraması" → "literatür tarama"). İfadeler ilk kelimelerine göre indekslenir; sorgu
+        # anında yalnızca sorgu kelimelerinin önekleriyle başlayan ifadeler denenir, en uzunu önce
+        self._phrase_docs = defaultdict(set)
+        for doc_id, tool in enumerate(tools):
+            for phrase in [tool["tool"], *tool.get("keywords", [])]:
+                folded = tuple(tokenize(phrase))
+                if folded:
+                    self._phrase_docs[folded].add(doc_id)
+        phrases = sorted(self._phrase_docs, key=lambda words: len(" ".join(words)), reverse=True)
+        self._phrases_by_first_word = defaultdict(list)
+        for words in phrases:
+            self._phrases_by_first_word[words[0]].append(words)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Tüm araçlar için BM25 skorları (tools sırasıyla)"""
+        scores = np.zeros(len(self.tools), dtype=np.float32)
+        for term in set(lexical_terms(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Skoru sıfırdan büyük en iyi k aracı (araç, skor) çiftleri olarak döndürür"""
+        scores = self.scores(query)
+        ranked = np.argsort(-scores, kind="stable")[:k]
+        return [(self.tools[i], float(scores[i])) for i in ranked if scores[i] > 0]
+
+    def _longest_phrase_at(self, tokens: list, position: int):
+        """tokens[position]'dan başlayan en uzun ifade (kelimeleri sırayla, ek almış olarak geçen); yoksa None"""
+        token = tokens[position]
+        best = None
+        for length in range(1, len(token) + 1):
+            for words in self._phrases_by_first_word.get(token[:length], ()):
+                if best is not None and len(" ".join(words)) <= len(" ".join(best)):
+                    break
+                if position + len(words) <= len(tokens) and all(
+                        tokens[position + i].startswith(word) for i, word in enumerate(words)):
+                    best = words
+                    break
+        return best
+
+    def phrase_hits(self, query: str) -> set:
+        """Sorguda adı ya da anahtar kelimesi birebir geçen araçların sıraları"""
+        tokens = tokenize(query)
+        hits = set()
+        position = 0
+        while position < len(tokens):
+            words = self._longest_phrase_at(tokens, position)
+            if words is None:
+                position += 1
+                continue
+            # Eşleşen ifadenin kelimeleri tüketilir; içlerinde geçen daha kısa ifadeler sayılmaz
+            hits |= self._phrase_docs[words]
+            position += len(words)
+        return hits
+
+    def decisive_search(self, query: str, k: int = 5) -> list:
+        """
+        Sözcük eşleşmesi tek başına yeterliyse search() sonucunu, değilse boş liste döndürür.
+        Kesinlik şartı: en iyi aracın adı/anahtar kelimesi sorguda birebir geçer ve ya başka hiçbir
+        aracın ifadesi geçmez ya da BM25 skoru ikinci araçtan en az LEXICAL_DECISIVE_MARGIN kat yüksektir.
+        """
+        scores = self.scores(query)
+        if not scores.size or scores.max() <= 0:
+            return []
+        ranked = np.argsort(-scores, kind="stable")
+        best = int(ranked[0])
+        hits = self.phrase_hits(query)
+        if best not in hits:
+            return []
+        if len(hits) > 1 and len(ranked) > 1 and scores[best] < LEXICAL_DECISIVE_MARGIN * scores[ranked[1]]:
+            return []
+        return [(self.tools[i], float(scores[i])) for i in ranked[:k] if scores[i] > 0]
@@ -0,0 +1,175 @@
+"""
+Aşama bazlı gecikme ölçümü ve Prometheus metin formatında /metrics çıktısı (dış bağımlılık yok).
+
+    with span("embedding"):                       # süre histograma ve isteğin zamanlama kaydına yazılır
+        ...
+    count_openai_call("chat", model, usage)       # istek sayısı + prompt/completion token'ları
+    count_fallback("intent_llm")                  # yedek yanıta düşülen durumlar
+
+Aşamalar: intent, embedding, index_load, scoring, web_search, summarization, formatting.
+Sayaçlar süreç (worker) başınadır; çok worker'lı kurulumda her worker ayrı bir hedef olarak toplanır.
+TIMING_HEADER açıksa her yanıta isteğin aşama süreleri Server-Timing başlığı olarak eklenir.
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TIMING_HEADER = os.getenv("TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_METRICS = {
+    "nlp_stage_duration_seconds": ("histogram", "İstek aşamalarının süresi"),
+    "nlp_request_duration_seconds": ("histogram", "İsteğin yanıt başlıkları gönderilene kadarki süresi"),
+    "nlp_openai_requests_total": ("counter", "OpenAI API çağrıları"),
+    "nlp_openai_tokens_total": ("counter", "OpenAI API token kullanımı"),
+    "nlp_fallbacks_total": ("counter", "Yedek yanıta ya da yedek yola düşülen durumlar"),
+    "nlp_upstream_retries_total": ("counter", "Upstream isteklerinin yeniden denenmesi"),
+    "nlp_upstream_hedges_total": ("counter", "Yavaş kalan upstream isteklerine gönderilen ikinci kopyalar"),
+    "nlp_upstream_rejections_total": ("counter", "Devre açık ya da hız sınırı dolu olduğu için gönderilmeyen istekler"),
+    "nlp_circuit_state": ("gauge", "Devre kesici durumu (0 kapalı, 1 yarı açık, 2 açık)"),
+    "nlp_startup_seconds": ("gauge", "Worker başlangıç adımlarının süresi"),
+    "nlp_startup_failed": ("gauge", "Başlangıçta hata verip atlanan adımlar"),
+}
+
+_lock = threading.Lock()
+# (metrik adı, etiketler) → değer; histogramlarda [kova sayıları, toplam, adet]
+_values = {}
+# Cache adı → stats() metodu olan cache nesnesi
+_caches = {}
+# İsteğin (aşama, süre) kayıtları; yalnızca start_request() çağrılan bağlamlarda dolar
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def observe(name: str, seconds: float, **labels):
+    with _lock:
+        entry = _values.setdefault(_key(name, labels), [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                entry[0][i] += 1
+        entry[1] += seconds
+        entry[2] += 1
+
+
+def inc(name: str, amount: float = 1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _values[key] = _values.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def register_cache(name: str, cache):
+    """Cache'in isabet/kaçırma/boyut istatistikleri /metrics çıktısına eklenir"""
+    _caches[name] = cache
+
+
+@contextmanager
+def span(stage: str):
+    """Bloğun süresini aşama histogramına ve (varsa) isteğin zamanlama kaydına yazar"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("nlp_stage_duration_seconds", elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def count_openai_call(kind: str, model: str, usage=None):
+    """kind: embedding | chat; usage: yanıttaki usage nesnesi (akışlı yanıtlarda son parçada gelir)"""
+    inc("nlp_openai_requests_total", kind=kind, model=model)
+    for field, token_type in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        # Embedding yanıtlarında completion_tokens alanı yoktur
+        tokens = getattr(usage, field, None)
+        if tokens is not None:
+            inc("nlp_openai_tokens_total", tokens, model=model, type=token_type)
+
+
+def count_fallback(reason: str):
+    inc("nlp_fallbacks_total", reason=reason)
+
+
+def start_request():
+    """Geçerli bağlamda yeni bir zamanlama kaydı başlatır; thread havuzuna copy_context() ile taşınabilir"""
+    _request_timings.set([])
+    return time.perf_counter()
+
+
+def finish_request(started: float, path: str, status: int) -> dict:
+    """İstek süresini kaydeder; TIMING_HEADER açıksa eklenecek başlıkları döndürür"""
+    elapsed = time.perf_counter() - started
+    observe("nlp_request_duration_seconds", elapsed, path=path, status=str(status))
+    timings = _request_timings.get() or []
+    _request_timings.set(None)
+    if not TIMING_HEADER:
+        return {}
+
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()]
+    parts.append(f"total;dur={elapsed * 1000:.1f}")
+    return {"Server-Timing": ", ".join(parts)}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def render() -> str:
+    """Tüm metrikleri Prometheus metin formatında döndürür"""
+    with _lock:
+        snapshot = {key: (list(value[0]), value[1], value[2]) if isinstance(value, list) else value
+                    for key, value in _values.items()}
+
+    lines = []
+    for name, (kind, help_text) in _METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in snapshot.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            buckets, total, count = value
+            for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    cache_stats = {name: cache.stats() for name, cache in _caches.items()}
+    cache_fields = (
+        ("hits", "counter", "Cache isabetleri"),
+        ("misses", "counter", "Cache kaçırmaları"),
+        ("evictions", "counter", "Cache'ten atılan kayıtlar"),
+        ("errors", "counter", "Cache SQLite hataları (kaçırma ya da atlanan yazma sayılır)"),
+        ("size", "gauge", "Cache'teki kayıt sayısı"),
+    ) if cache_stats else ()
+    for field, kind, help_text in cache_fields:
+        name = f"nlp_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, stats in sorted(cache_stats.items()):
+            lines.append(f"{name}{_format_labels((('cache', cache_name),))} {stats.get(field, 0)}")
+    return "\n".join(lines) + "\n"
@@ -1,34 +1,66 @@
 import os
 import json
-import numpy as np
-from pathlib import Path
+import contextvars
 from dotenv import load_dotenv
-import openai
-from tool_scrapers import get_consensus_answer
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait
+from tool_scrapers import chat_completion, get_consensus_answer, stream_consensus_answer
+from doc_index import has_doc_index, get_tool_doc_answer, stream_tool_doc_answer
+from embedders import get_embedder
+from tool_index import EMBEDDING_MODEL, get_tool_index as _get_tool_index
+from intent_classifier import IntentClassifier
+from cache import TTLCache, SemanticCache, cache_key
+from metrics import count_fallback, register_cache, span
+from resilience import UPSTREAM_ERRORS, UpstreamUnavailable, get_upstream
+from text_utils import tool_to_slug
 
 # Ortam değişkenini yükle
 load_dotenv()
 
-# OpenAI API key'ini environment variable'dan al
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable bulunamadı!")
-
-client = openai.OpenAI(api_key=api_key)  
-
-TOOLS_PATH = Path("tools.json")
-CACHE_PATH = Path("embedding_cache.json")
-
-def detect_intent_and_context(message: str, conversation_history: list = None) -> dict:
-    """
-    Mesajın intent'ini ve context'ini algılar.
-    Returns: {
-        'intent': 'SELAM' | 'TEŞEKKÜR' | 'SORU' | 'TAKIP_SORU',
-        'context': 'previous_tool' | 'new_request' | None,
-        'specific_request': 'grammer_check' | 'reference_check' | 'alternative' | None
-    }
-    """
-    
+# Embedding backend'i EMBEDDER ile seçilir; OpenAI client'ı ilk istekte kurulur, böylece
+# EMBEDDER=local ile servis OPENAI_API_KEY olmadan da açılır (LLM gerektiren adımlar yedek yanıta düşer)
+embedder = get_embedder()
+
+# Bir aracın öneri olarak kabul edilmesi için gereken minimum benzerlik (seçili backend'e göre)
+MIN_SIMILARITY = embedder.min_similarity
+# Yanıtta gösterilecek en fazla alternatif aday sayısı
+MAX_RUNNER_UPS = 2
+
+INTENT_MODEL = "gpt-3.5-turbo"
+
+# Sorgu embedding'leri ve LLM intent sonuçları için LRU + TTL cache; QUERY_CACHE_PATH verilirse SQLite'ta kalıcıdır
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "5000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH") or None
+
+embedding_cache = TTLCache(
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_PATH, namespace="embedding",
+    encode=lambda vector: vector.tobytes(), decode=lambda data: np.frombuffer(data, dtype=np.float32),
+)
+intent_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_PATH, namespace="intent")
+
+# Anlamca yakın (farklı yazılmış) sorular için hazır yanıt cache'i; araç indeksi değişince geçersiz olur
+# (benzerlik eşiği verilmezse seçili backend'in kalibre edilmiş değeri kullanılır)
+response_cache = SemanticCache(
+    max_size=int(os.getenv("SEMANTIC_CACHE_SIZE", "1000")),
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD") or embedder.semantic_cache_threshold),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+)
+register_cache("embedding", embedding_cache)
+register_cache("intent", intent_cache)
+register_cache("response", response_cache)
+
+# Intent sınıflandırmasıyla paralel yürüyen spekülatif embedding ve LLM intent çağrıları için
+# (ayrı havuzlar: uzun süren LLM çağrıları embedding'leri kuyrukta bekletmez)
+SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="speculative")
+_intent_executor = ThreadPoolExecutor(max_workers=SPECULATIVE_WORKERS, thread_name_prefix="intent-llm")
+
+# Sorgu embedding'i bu süre (sn) içinde hazır olmazsa LLM intent çağrısı centroid eşleşmesini beklemeden başlar
+INTENT_CENTROID_WAIT = float(os.getenv("INTENT_CENTROID_WAIT", "0.05"))
+
+def build_intent_prompt(message: str, conversation_history: list = None) -> tuple:
+    """LLM intent sınıflandırması için (cache anahtarı, prompt) döndürür"""
     # Conversation history varsa context oluştur
     context = ""
     if conversation_history and len(conversation_history) > 1:
@@ -38,6 +70,8 @@ def detect_intent_and_context(message: str, conversation_history: list = None) -
             context += f"{role}: {msg.get('text', '')}\n"
     
     full_message = f"Conversation context:\n{context}\nCurrent message: {message}" if context else message
+
+    intent_key = cache_key(full_message, INTENT_MODEL)
     
     prompt = f"""
 Analyze this message and conversation context to determine:
@@ -57,121 +91,213 @@ Look for patterns like:
 Respond ONLY in this JSON format:
 {{"intent": "SELAM|TEŞEKKÜR|SORU|TAKIP_SORU", "request_type": "grammar|reference|alternative|previous_request|new_topic", "confidence": 0.9}}
 """
+    return intent_key, prompt
 
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1
-    )
-
+def parse_intent_response(content: str, intent_key: str) -> dict:
+    """LLM'in JSON yanıtını ayrıştırır; başarılı sonuçlar intent cache'ine yazılır"""
     try:
-        import json
-        result = json.loads(response.choices[0].message.content.strip())
-        return result
+        result = json.loads(content.strip())
+        result["source"] = "llm"
+        intent_cache.set(intent_key, result)
+        return dict(result)
     except:
         # Fallback
-        return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.5}
+        return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.5, "source": "llm"}
 
+def llm_intent(intent_key: str, prompt: str) -> dict:
+    """LLM intent sınıflandırması; upstream kullanılamazsa yedek sonuç döner"""
+    try:
+        content = chat_completion(prompt, INTENT_MODEL, temperature=0.1)
+    except UPSTREAM_ERRORS as e:
+        print(f"⚠️ LLM intent sınıflandırması yapılamadı: {e}")
+        count_fallback("intent_llm")
+        return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.5, "source": "fallback"}
+    return parse_intent_response(content, intent_key)
+
+def detect_intent_and_context(message: str, conversation_history: list = None, get_query_embedding=None,
+                              embedding_future=None) -> dict:
+    """
+    Mesajın intent'ini ve context'ini algılar.
+    Önce yerel sınıflandırıcı (kurallar + örnek centroid'leri) denenir, yalnızca emin olunamazsa LLM'e gidilir.
+    get_query_embedding: verilirse centroid eşleşmesi için mesajın embedding'ini döndüren çağrı.
+    embedding_future: get_query_embedding yerine verilebilir; embedding INTENT_CENTROID_WAIT içinde hazır
+        olmazsa LLM çağrısı paralel başlar, centroid eşleşirse LLM sonucu beklenmez (intent cache'ine yine yazılır).
+    Returns: {
+        'intent': 'SELAM' | 'TEŞEKKÜR' | 'SORU' | 'TAKIP_SORU',
+        'request_type': 'grammar' | 'reference' | 'alternative' | 'previous_request' | 'new_topic',
+        'confidence': float,
+        'source': 'rules' | 'centroid' | 'llm' | 'fallback'
+    }
+    """
+    rule_result = intent_classifier.match_rules(message, conversation_history)
+    if rule_result is not None:
+        return rule_result
+
+    intent_key, prompt = build_intent_prompt(message, conversation_history)
+    cached_result = intent_cache.get(intent_key)
+    if cached_result is not None:
+        return dict(cached_result)
+
+    llm_future = None
+    if embedding_future is not None:
+        get_query_embedding = embedding_future.result
+        # Embedding gecikiyorsa LLM çağrısı şimdi başlar; ikisi sırayla değil paralel bekler
+        if not wait([embedding_future], INTENT_CENTROID_WAIT).done:
+            llm_future = _intent_executor.submit(contextvars.copy_context().run, llm_intent, intent_key, prompt)
+
+    local_result = intent_classifier.match_centroid(get_query_embedding, conversation_history)
+    if local_result is not None:
+        if llm_future is not None:
+            llm_future.cancel()
+        return local_result
+    if llm_future is not None:
+        return llm_future.result()
+    return llm_intent(intent_key, prompt)
 
-# Cosine Similarity
-def cosine_similarity(a, b):
-    a = np.array(a)
-    b = np.array(b)
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 # Embedding al
-def get_embedding(text: str) -> list:
-    response = client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
-    return response.data[0].embedding
-
-# tools.json + cache.json → tüm araç embedding'lerini yükle
-def load_tools_with_embeddings():
-    tools = json.loads(TOOLS_PATH.read_text(encoding="utf-8"))
-
-    if CACHE_PATH.exists():
-        cache = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
-    else:
-        cache = {}
-
-    updated = False
-    for tool in tools:
-        key = tool["tool"]
-        if key not in cache:
-            text_for_embedding = f"{tool['tool']}. {tool['academic_use']}. Keywords: {'; '.join(tool['keywords'])}."
-            print(f"→ Embedding alınıyor: {key}")
-            cache[key] = get_embedding(text_for_embedding)
-            updated = True
-
-        tool["embedding"] = cache[key]
-
-    if updated:
-        CACHE_PATH.write_text(json.dumps(cache, indent=2), encoding="utf-8")
-
-    return tools
-
-# Tool adını URL slug'a çevir
-def tool_to_slug(tool_name: str) -> str:
-    """Tool adını URL slug formatına çevirir"""
-    import re
-    # Küçük harfe çevir ve özel karakterleri tire ile değiştir
-    slug = re.sub(r'[^a-z0-9]+', '-', tool_name.lower())
-    # Başta ve sonunda tire varsa temizle
-    slug = slug.strip('-')
-    return slug
+def get_embedding(text: str) -> np.ndarray:
+    with span("embedding"):
+        # Yerel backend cache'ten daha hızlıdır; yalnızca uzak backend'in sonuçları cache'lenir
+        if not embedder.remote:
+            return embedder.embed(text)
+        key = cache_key(text, EMBEDDING_MODEL)
+        embedding = embedding_cache.get(key)
+        if embedding is None:
+            embedding = embedder.embed(text)
+            embedding_cache.set(key, embedding)
+        return embedding
+
+def ensure_embedding_available(text: str):
+    """
+    Uzak embedding upstream'inin devresi açıksa ve sorgunun embedding'i cache'te yoksa beklemeden
+    UpstreamUnavailable fırlatır; böylece vektör yolu zaten çalışamayacakken intent LLM çağrısı beklenmez.
+    """
+    if not embedder.remote:
+        return
+    upstream = get_upstream("embedding")
+    if upstream.breaker(EMBEDDING_MODEL).is_open() and embedding_cache.get(cache_key(text, EMBEDDING_MODEL)) is None:
+        upstream.reject_if_open(EMBEDDING_MODEL)
+
+def cache_stats() -> dict:
+    """Sorgu cache'lerinin isabet oranı ve boyut bilgileri"""
+    return {"embedding": embedding_cache.stats(), "intent": intent_cache.stats(), "response": response_cache.stats()}
+
+# Selamlaşma, teşekkür ve belirgin takip sorularını LLM'e gitmeden yakalayan yerel katman
+intent_classifier = IntentClassifier()
+
+# tools.json + embedding cache → süreç genelindeki araç indeksi
+def get_tool_index():
+    """Bellekteki araç indeksini döndürür; dosyalar değişmedikçe yeniden okunmaz"""
+    with span("index_load"):
+        return _get_tool_index()
 
 def get_specific_tools_by_category(request_type: str, language: str = "tr") -> list:
-    """Belirli kategorilerdeki araçları döndürür"""
-    tools = load_tools_with_embeddings()
-    
-    category_mapping = {
-        "grammar": ["Grammarly", "DeepL Write", "QuillBot"],
-        "reference": ["Scite.ai", "Consensus", "Elicit"], 
-        "presentation": ["Gamma.app", "SlidesAI", "ClassPoint"],
-        "video": ["Pictory"],
-        "planning": ["Teachermatic", "Eduaide.ai"],
-        "quiz": ["Quizgecko"],
-        "summary": ["Mindgrasp", "QuillBot", "Consensus"]
-    }
-    
-    if request_type in category_mapping:
-        tool_names = category_mapping[request_type]
-        return [tool for tool in tools if tool["tool"] in tool_names]
-    
-    return tools
+    """Belirli kategorilerdeki araçları döndürür (kategoriler tools.json'daki "categories" alanından gelir)"""
+    index = get_tool_index()
+    return index.tools_in_category(request_type) or index.tools
 
 def find_alternative_tools(previous_tool_name: str, category: str, language: str = "tr") -> list:
-    """Bir araç önerilmişse, aynı kategoriden alternatifler bulur"""
-    tools = load_tools_with_embeddings()
-    
-    # Aynı kategori mapping'den alternatifler bul
-    category_mapping = {
-        "grammar": ["Grammarly", "DeepL Write", "QuillBot"],
-        "reference": ["Scite.ai", "Consensus", "Elicit"], 
-        "presentation": ["Gamma.app", "SlidesAI", "ClassPoint"],
-        "video": ["Pictory"],
-        "planning": ["Teachermatic", "Eduaide.ai"],
-        "quiz": ["Quizgecko"],
-        "summary": ["Mindgrasp", "QuillBot", "Consensus"]
-    }
-    
-    for cat, tool_names in category_mapping.items():
-        if previous_tool_name in tool_names:
-            # Aynı kategoriden, önceki araç hariç diğerlerini döndür
-            alternatives = [tool for tool in tools if tool["tool"] in tool_names and tool["tool"] != previous_tool_name]
-            return alternatives
-    
-    return []
+    """Bir araç önerilmişse, aynı kategoriden (yoksa en yakın) alternatifleri embedding yakınlığına göre döndürür"""
+    return get_tool_index().alternatives.get(previous_tool_name, [])
+
+def last_recommended_tool(conversation_history: list):
+    """Konuşmada en son önerilen aracı döndürür; yoksa None"""
+    return get_tool_index().last_recommended(conversation_history)
+
+def matched_tool(tool_name: str, response: str):
+    """Akışlı yanıtın meta olayı için: araç bazlı sohbette istenen araç, genel sohbette yanıtta önerilen araç"""
+    if tool_name or not response:
+        return tool_name
+    recommended = get_tool_index().recommended_tool(response)
+    return recommended["tool"] if recommended is not None else None
+
+def decisive_matches(user_input: str, conversation_history: list = None, k: int = 1) -> list:
+    """
+    Yerel BM25 indeksinin kesin eşleşmeleri (bkz. LexicalIndex.decisive_search).
+    Kesin araç konuşmada son önerilen araçsa mesaj onun hakkında bir takip sorusudur
+    ("Scite.ai dışında ... ne var"); kısayol kullanılmaz, karar sınıflandırıcıya ve vektör aramasına kalır.
+    """
+    index = get_tool_index()
+    matches = index.lexical.decisive_search(user_input, k=k)
+    if matches:
+        previous_tool = index.last_recommended(conversation_history)
+        if previous_tool is not None and previous_tool["tool"] == matches[0][0]["tool"]:
+            return []
+    return matches
+
+def lexical_intent(user_input: str, conversation_history: list = None) -> dict:
+    """Sorgu yerel BM25 indeksinde kesin bir araca işaret ediyorsa yeni bir soru kabul edilir"""
+    if decisive_matches(user_input, conversation_history):
+        return {"intent": "SORU", "request_type": "new_topic", "confidence": 0.9, "source": "lexical"}
+    return None
 
 # Ana RAG fonksiyonu
 def find_best_tool(user_input: str, language: str = "tr", conversation_history: list = None) -> str:
+    return find_best_tool_with_intent(user_input, language, conversation_history)[0]
+
+def find_best_tool_with_intent(user_input: str, language: str = "tr", conversation_history: list = None) -> tuple:
+    """find_best_tool ile aynı; yanıtla birlikte tespit edilen intent sonucunu da döndürür (oturum kaydı için)"""
     if conversation_history is None:
         conversation_history = []
+
+    # Kurallarla kesinleşen mesajlar (selam, teşekkür, belirgin takip soruları) ve bir aracın adı/anahtar
+    # kelimesiyle kesin eşleşen sorular hiç beklemeden, embedding ya da LLM çağrısı olmadan yanıtlanır
+    with span("intent"):
+        intent_result = (intent_classifier.match_rules(user_input, conversation_history)
+                         or lexical_intent(user_input, conversation_history))
+    if intent_result is not None:
+        response = answer_for_intent(user_input, language, conversation_history, intent_result, lambda: get_embedding(user_input))
+        return response, intent_result
+
+    ensure_embedding_available(user_input)
+
+    # Sorgu embedding'i intent sınıflandırmasını beklemeden spekülatif olarak başlar
+    # (isteğin zamanlama kaydı thread'e bağlamla birlikte taşınır)
+    embedding_future = _executor.submit(contextvars.copy_context().run, get_embedding, user_input)
+    try:
+        # Gelişmiş intent ve context detection
+        with span("intent"):
+            intent_result = detect_intent_and_context(user_input, conversation_history, embedding_future=embedding_future)
+        response = answer_for_intent(user_input, language, conversation_history, intent_result, embedding_future.result)
+        return response, intent_result
+    finally:
+        # Selamlaşma, teşekkür veya kategori takibinde embedding'e gerek yok; sonucu atılır
+        embedding_future.cancel()
+
+def format_tool_recommendation(matches: list, language: str = "tr") -> str:
+    """Sıralı [(araç, skor)] listesinden ilk aracı öneren, diğerlerini seçenek olarak listeleyen yanıt"""
+    best_tool, best_score = matches[0]
+    runner_ups = ", ".join(tool["tool"] for tool, _ in matches[1:])
+
+    # Tool slug'ını oluştur
+    tool_slug = tool_to_slug(best_tool["tool"])
+    internal_link = f"http://localhost:3000/tools/{tool_slug}"
     
-    # Gelişmiş intent ve context detection
-    intent_result = detect_intent_and_context(user_input, conversation_history)
+    # Dil desteğine göre response
+    if language == "en":
+        academic_use = best_tool.get("academic_use_en", best_tool["academic_use"])
+        other_options = f"\n🔎 Other options: {runner_ups}" if runner_ups else ""
+        return f"""{best_tool["tool"]}: {academic_use}
+
+📄 Detailed Review: {internal_link}
+🌐 Official Site: {best_tool["link"]}{other_options}
+
+💡 You can find video tutorials and usage guides on our detailed page!"""
+    else:
+        other_options = f"\n🔎 Diğer seçenekler: {runner_ups}" if runner_ups else ""
+        return f"""{best_tool["tool"]}: {best_tool["academic_use"]}
+
+📄 Detaylı İnceleme: {internal_link}
+🌐 Resmi Site: {best_tool["link"]}{other_options}
+
+💡 Detaylı sayfamızda videolu eğitimler ve kullanım rehberi bulabilirsiniz!"""
+
+def answer_for_intent(user_input: str, language: str, conversation_history: list, intent_result: dict, get_query_embedding) -> str:
+    """
+    Intent sonucuna göre yanıtı üretir.
+    get_query_embedding: sorgu embedding'ini döndüren çağrı; yalnızca standart RAG yolunda çağrılır.
+    """
     intent = intent_result.get("intent", "SORU")
     request_type = intent_result.get("request_type", "new_topic")
 
@@ -188,25 +314,17 @@ def find_best_tool(user_input: str, language: str = "tr", conversation_history:
         
         # Takip sorusu ise özel logic
         if intent == "TAKIP_SORU":
-            # Önceki mesajlardan önerilen araçları bul
-            previous_tools = []
-            if conversation_history:
-                for msg in conversation_history:
-                    if msg.get("from") == "bot" and ":" in msg.get("text", ""):
-                        # Bot mesajından araç adını çıkar
-                        bot_text = msg.get("text", "")
-                        if bot_text.startswith(("Gamma.app", "Grammarly", "Scite.ai", "Consensus", "Elicit", "DeepL", "QuillBot", "SlidesAI", "ClassPoint", "Pictory", "Teachermatic", "Eduaide", "Scholar", "Quizgecko", "Mindgrasp")):
-                            tool_name = bot_text.split(":")[0].strip()
-                            previous_tools.append(tool_name)
-            
             # Request type'a göre farklı yaklaşımlar
-            if request_type == "alternative" and previous_tools:
+            previous_tool = last_recommended_tool(conversation_history) if request_type == "alternative" else None
+            if previous_tool is not None:
                 # Alternatif araç öner
-                last_tool = previous_tools[-1]
-                alternatives = find_alternative_tools(last_tool, "", language)
+                last_tool = previous_tool["tool"]
+                # Konuşmada zaten önerilmiş araçlar atlanır; "peki başka" zinciri iki araç arasında gidip gelmez
+                shown = {tool["tool"] for tool in get_tool_index().recommended_tools(conversation_history)}
+                alternatives = [tool for tool in find_alternative_tools(last_tool, "", language) if tool["tool"] not in shown]
                 
                 if alternatives:
-                    best_alt = alternatives[0]  # İlk alternatifi al
+                    best_alt = alternatives[0]  # Henüz gösterilmemiş ilk alternatifi al
                     tool_slug = tool_to_slug(best_alt["tool"])
                     internal_link = f"http://localhost:3000/tools/{tool_slug}"
                     
@@ -234,7 +352,7 @@ def find_best_tool(user_input: str, language: str = "tr", conversation_history:
                 # Grammar tools öner
                 grammar_tools = get_specific_tools_by_category("grammar", language)
                 if grammar_tools:
-                    best_tool = grammar_tools[0]  # Grammarly ilk sırada
+                    best_tool = grammar_tools[0]  # Grammarly ilk sırada (tools.json "category_rank")
                     tool_slug = tool_to_slug(best_tool["tool"])
                     internal_link = f"http://localhost:3000/tools/{tool_slug}"
                     
@@ -258,7 +376,7 @@ def find_best_tool(user_input: str, language: str = "tr", conversation_history:
                 # Reference tools öner
                 ref_tools = get_specific_tools_by_category("reference", language)
                 if ref_tools:
-                    best_tool = ref_tools[0]  # Scite.ai ilk sırada
+                    best_tool = ref_tools[0]  # Scite.ai ilk sırada (tools.json "category_rank")
                     tool_slug = tool_to_slug(best_tool["tool"])
                     internal_link = f"http://localhost:3000/tools/{tool_slug}"
                     
@@ -279,78 +397,58 @@ def find_best_tool(user_input: str, language: str = "tr", conversation_history:
 🌐 Resmi Site: {best_tool["link"]}"""
         
         # Normal soru için standard RAG
-        tools = load_tools_with_embeddings()
-        input_emb = get_embedding(user_input)
-
-        best_tool = None
-        best_score = -1
-
-        for tool in tools:
-            sim = cosine_similarity(input_emb, tool["embedding"])
-            if sim > best_score:
-                best_score = sim
-                best_tool = tool
-
-        if best_score < 0.75:
+        index = get_tool_index()
+
+        # Araç adı/anahtar kelimesi sorguda birebir geçiyorsa yerel BM25 yeterli: embedding çağrısı yok
+        with span("scoring"):
+            matches = decisive_matches(user_input, conversation_history, k=1 + MAX_RUNNER_UPS)
+        if matches:
+            with span("formatting"):
+                return format_tool_recommendation(matches, language)
+
+        input_emb = get_query_embedding()
+
+        # Şablonlar yalnızca "en"e göre dallanır; istekten gelen başka değerler ayrı cache alanı açmaz
+        cache_language = "en" if language == "en" else "tr"
+        cached_response = response_cache.get(input_emb, cache_language, index.fingerprint)
+        if cached_response is not None:
+            return cached_response
+
+        with span("scoring"):
+            matches = index.hybrid_search(user_input, input_emb, k=1 + MAX_RUNNER_UPS, min_score=MIN_SIMILARITY)
+        if not matches:
             return not_found_msg
 
-        # Tool slug'ını oluştur
-        tool_slug = tool_to_slug(best_tool["tool"])
-        internal_link = f"http://localhost:3000/tools/{tool_slug}"
-        
-        # Dil desteğine göre response
-        if language == "en":
-            academic_use = best_tool.get("academic_use_en", best_tool["academic_use"])
-            response = f"""{best_tool["tool"]}: {academic_use}
-
-📄 Detailed Review: {internal_link}
-🌐 Official Site: {best_tool["link"]}
-
-💡 You can find video tutorials and usage guides on our detailed page!"""
-        else:
-            response = f"""{best_tool["tool"]}: {best_tool["academic_use"]}
-
-📄 Detaylı İnceleme: {internal_link}
-🌐 Resmi Site: {best_tool["link"]}
-
-💡 Detaylı sayfamızda videolu eğitimler ve kullanım rehberi bulabilirsiniz!"""
-        
+        with span("formatting"):
+            response = format_tool_recommendation(matches, language)
+        response_cache.set(input_emb, cache_language, index.fingerprint, response)
         return response
     
     # Varsayılan cevap
     return greeting_msg
 
-def find_tool_specific_answer(tool_name: str, user_input: str, language: str = "tr", conversation_history: list = None) -> str:
-    """
-    Belirli bir tool hakkında detaylı soru-cevap yapar.
-    Tool'un resmi web sitesinden scrape edilen bilgileri kullanır.
-    """
-    if conversation_history is None:
-        conversation_history = []
-    
-    # Tool-specific handlers
-    tool_handlers = {
-        "Consensus": get_consensus_answer,
-        # Diğer tool'ları buraya ekleyeceğiz
-    }
-    
-    if tool_name in tool_handlers:
-        try:
-            # Tool-specific yanıt al - SADECE tool-specific, fallback yok
-            answer = tool_handlers[tool_name](user_input, language)
-            return answer
-            
-        except Exception as e:
-            print(f"❌ Tool-specific error for {tool_name}: {e}")
-            # Hata durumunda sadece tool'a özel hata mesajı
-            if language == "en":
-                return f"I'm having trouble accessing information about {tool_name} right now. Please try again or visit the official website for more information."
-            else:
-                return f"Şu anda {tool_name} hakkında bilgilere erişimde sorun yaşıyorum. Lütfen tekrar deneyin veya daha fazla bilgi için resmi web sitesini ziyaret edin."
-    
+# Tool-specific handlers (web araması + özetleme)
+TOOL_HANDLERS = {
+    "Consensus": get_consensus_answer,
+    # Diğer tool'ları buraya ekleyeceğiz
+}
+
+# Akışlı (streaming) karşılıkları olan handler'lar; olmayanların yanıtı tek parça halinde gönderilir
+TOOL_STREAM_HANDLERS = {
+    "Consensus": stream_consensus_answer,
+}
+
+def tool_handler_error_message(tool_name: str, language: str = "tr") -> str:
+    """Tool'a özel handler başarısız olduğunda gösterilen mesaj"""
+    if language == "en":
+        return f"I'm having trouble accessing information about {tool_name} right now. Please try again or visit the official website for more information."
+    else:
+        return f"Şu anda {tool_name} hakkında bilgilere erişimde sorun yaşıyorum. Lütfen tekrar deneyin veya daha fazla bilgi için resmi web sitesini ziyaret edin."
+
+def tool_fallback_answer(tool_name: str, language: str = "tr") -> str:
+    """tools.json'daki genel bilgilerden üretilen, hiçbir dış çağrı gerektirmeyen yanıt"""
     # Fallback: Genel tool bilgisi
-    tools = load_tools_with_embeddings()
-    tool_info = next((tool for tool in tools if tool["tool"] == tool_name), None)
+    tool_info = get_tool_index().get(tool_name)
     
     if tool_info:
         tool_slug = tool_to_slug(tool_info["tool"])
@@ -387,3 +485,80 @@ Nasıl kullanılır: {tool_info["how_to"]}
         return f"I don't have detailed information about {tool_name}. Please check our tools page for more information."
     else:
         return f"{tool_name} hakkında detaylı bilgim bulunmuyor. Daha fazla bilgi için araçlar sayfamızı kontrol edin."
+
+def upstream_unavailable_answer(tool_name: str, language: str, error: UpstreamUnavailable) -> str:
+    """Devre açık ya da hız sınırı doluyken: upstream'i beklemeden tools.json bilgisiyle yanıt verilir"""
+    print(f"⚡ {tool_name} için upstream kullanılamıyor ({error.upstream}: {error.reason}); tools.json yanıtı veriliyor")
+    count_fallback(f"upstream_{error.reason}")
+    return tool_fallback_answer(tool_name, language)
+
+def find_tool_specific_answer(tool_name: str, user_input: str, language: str = "tr", conversation_history: list = None) -> str:
+    """
+    Belirli bir tool hakkında detaylı soru-cevap yapar.
+    Önce doc_index.py ile kurulmuş yerel indeksi, yoksa tool'a özel web handler'ını kullanır.
+    """
+    if conversation_history is None:
+        conversation_history = []
+
+    # Önceden kurulmuş yerel doküman indeksi varsa web araması yok: k-NN + tek üretim çağrısı
+    if has_doc_index(tool_name):
+        try:
+            tool_info = get_tool_index().get(tool_name) or {}
+            return get_tool_doc_answer(tool_name, user_input, get_embedding(user_input), language, tool_info.get("link", ""))
+        except UpstreamUnavailable as e:
+            return upstream_unavailable_answer(tool_name, language, e)
+        except Exception as e:
+            print(f"❌ Doc index error for {tool_name}: {e}")
+            count_fallback("doc_index")
+    
+    return tool_handler_answer(tool_name, user_input, language)
+
+def tool_handler_answer(tool_name: str, user_input: str, language: str = "tr") -> str:
+    """Doküman indeksi yoksa ya da başarısız olduysa: tool'a özel handler, o da yoksa tools.json bilgisi"""
+    if tool_name in TOOL_HANDLERS:
+        try:
+            # Tool-specific yanıt al - SADECE tool-specific, fallback yok
+            answer = TOOL_HANDLERS[tool_name](user_input, language)
+            return answer
+
+        except UpstreamUnavailable as e:
+            return upstream_unavailable_answer(tool_name, language, e)
+        except Exception as e:
+            print(f"❌ Tool-specific error for {tool_name}: {e}")
+            count_fallback("tool_handler")
+            # Hata durumunda sadece tool'a özel hata mesajı
+            return tool_handler_error_message(tool_name, language)
+    
+    return tool_fallback_answer(tool_name, language)
+
+def stream_tool_specific_answer(tool_name: str, user_input: str, language: str = "tr", conversation_history: list = None):
+    """
+    find_tool_specific_answer'ın akışlı karşılığı: yanıt parçalarını üretildikçe yield eder.
+    Parçaların birleşimi non-stream yanıtla aynı metindir.
+    """
+    if has_doc_index(tool_name):
+        started = False
+        try:
+            tool_info = get_tool_index().get(tool_name) or {}
+            for chunk in stream_tool_doc_answer(tool_name, user_input, get_embedding(user_input), language, tool_info.get("link", "")):
+                started = True
+                yield chunk
+            return
+        except UpstreamUnavailable as e:
+            # Akış açılmadan reddedilir; henüz hiçbir parça gönderilmemiştir
+            yield upstream_unavailable_answer(tool_name, language, e)
+            return
+        except Exception as e:
+            print(f"❌ Doc index error for {tool_name}: {e}")
+            count_fallback("doc_index")
+            if started:
+                return
+
+    if tool_name in TOOL_STREAM_HANDLERS:
+        try:
+            yield from TOOL_STREAM_HANDLERS[tool_name](user_input, language)
+        except UpstreamUnavailable as e:
+            yield upstream_unavailable_answer(tool_name, language, e)
+        return
+
+    yield tool_handler_answer(tool_name, user_input, language)
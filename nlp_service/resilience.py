@@ -0,0 +1,368 @@
+"""
+Upstream (OpenAI, web araması) çağrıları için ortak dayanıklılık katmanı.
+
+    response = get_upstream("chat").call(model, lambda timeout: ..., key=prompt_key)
+
+Her çağrı sırayla şu adımlardan geçer:
+    1. Devre kesici: upstream art arda hata veriyorsa istek hiç gönderilmeden UpstreamUnavailable fırlatılır;
+       reset süresi dolunca tek bir deneme isteği geçirilir, başarılıysa devre kapanır.
+    2. Single-flight: aynı anahtarla uçuşta olan bir istek varsa yenisi gönderilmez, onun sonucu paylaşılır.
+    3. Token bucket: model başına saniyelik istek sınırı; sıra beklemek deadline'ı aşacaksa beklenmez.
+    4. Deadline'a göre yeniden deneme: her denemeye kalan süreye göre timeout verilir, geçici hatalarda
+       jitter'lı üstel beklemeyle tekrar denenir; kalan süre bir denemeye yetmiyorsa son hata fırlatılır.
+    5. Hedging (isteğe bağlı): deneme hedge_after saniyede dönmezse ikinci bir kopya gönderilir, önce dönen kazanır.
+
+fn, deneme başına timeout'u (sn) alır ve bu sürede dönmeyi garanti etmelidir (OpenAI client'ına
+with_options(timeout=..., max_retries=0), DDGS'e timeout=... verilir). Yeniden denemeler yalnızca bu
+katmanda yapılır; OpenAI client'ının kendi yeniden denemeleri kapatılır.
+
+Bu modül senkron yol (Flask) içindir; async yol aynı devre kesicileri check()/record() ile paylaşır.
+"""
+import os
+import math
+import time
+import random
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import openai
+
+from cache import SingleFlight
+from metrics import inc, set_gauge
+
+# Geçici sayılan (yeniden denemeye değer) OpenAI hataları
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "16"))
+# Model bazında istek/sn sınırları, ör. "gpt-3.5-turbo=20,text-embedding-ada-002=50"
+UPSTREAM_RATE_LIMITS = os.getenv("UPSTREAM_RATE_LIMITS", "")
+
+# Yeniden denemeler arasındaki bekleme: 0.25, 0.5, 1, ... sn (en fazla 4 sn), ×[0.5, 1.5) jitter
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+# Kalan süre bundan kısaysa yeni deneme başlatılmaz
+MIN_ATTEMPT_TIMEOUT = 0.2
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class UpstreamError(Exception):
+    """Dayanıklılık katmanının kendi hataları; upstream'in hataları (openai.OpenAIError vb.) olduğu gibi iletilir"""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """İstek gönderilmedi: devre açık ya da hız sınırı deadline içinde izin vermiyor"""
+
+    def __init__(self, upstream: str, model: str, reason: str, retry_after: int = 1):
+        super().__init__(f"{upstream} upstream'i ({model}) şu anda kullanılamıyor: {reason}")
+        self.upstream = upstream
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class UpstreamTimeout(UpstreamError):
+    """Deneme (hedge kopyasıyla birlikte) kendisine verilen sürede dönmedi"""
+
+
+# Çağıranların yedek yanıta düşmek için yakalaması gereken hatalar
+UPSTREAM_ERRORS = (openai.OpenAIError, UpstreamError)
+
+
+class TokenBucket:
+    """Saniyede rate token dolan, en fazla burst token biriktiren kova; rate <= 0 ise sınırsız"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float) -> bool:
+        """Bir token alır; gerekirse bekler. Bekleme timeout'u aşacaksa hiç beklemeden False döner"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            wait_time = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait_time > timeout:
+                return False
+            # Token şimdiden ayrılır (bakiye eksiye düşebilir); sonraki çağıranlar sırayla daha uzun bekler
+            self._tokens -= 1.0
+        if wait_time:
+            time.sleep(wait_time)
+        return True
+
+    def try_acquire(self) -> bool:
+        return self.acquire(0.0)
+
+
+class CircuitBreaker:
+    """
+    closed → art arda failure_threshold hata → open → reset_timeout sonra half_open (tek deneme isteği)
+    → başarılıysa closed, başarısızsa yeniden open.
+    """
+
+    def __init__(self, upstream: str, model: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.upstream = upstream
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"⚡ Devre kesici {self.upstream} ({self.model}): {self.state} → {state}")
+            self.state = state
+            set_gauge("nlp_circuit_state", CIRCUIT_STATES[state], upstream=self.upstream, model=self.model)
+
+    def allow(self) -> bool:
+        """İstek gönderilebilir mi; half_open durumunda yalnızca ilk çağırana izin verilir"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def is_open(self) -> bool:
+        """Devre açık ve reset süresi dolmamış mı; allow()'dan farkı durumu değiştirmemesi ve deneme hakkı almaması"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def retry_after(self) -> int:
+        """Devrenin yeniden deneme isteğine izin vermesine kalan süre (sn, en az 1)"""
+        remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def record(self, ok):
+        """ok: True başarı, False upstream hatası, None sonuç yok (istek gönderilmedi)"""
+        with self._lock:
+            self._probing = False
+            if ok is None:
+                return
+            if ok:
+                self._failures = 0
+                self._set_state("closed")
+                return
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+
+# Hedge kopyalarını ve ilk denemeyi beklerken çalıştıran havuz (yalnızca hedging açıksa kullanılır)
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _hedge_executor
+
+
+def _parse_rate_limits(value: str) -> dict:
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, rate = item.rsplit("=", 1)
+            limits[model.strip()] = float(rate)
+    return limits
+
+
+class Upstream:
+    """
+    Bir upstream türü (chat, embedding, web_search) için ayarlar ve model başına durum.
+    rate: model başına varsayılan istek/sn (UPSTREAM_RATE_LIMITS ile model bazında değiştirilebilir)
+    deadline: bir çağrının tüm denemeleri ve beklemeleri dahil toplam süresi
+    attempt_timeout: tek bir denemenin en uzun süresi
+    hedge_after: 0'dan büyükse deneme bu kadar saniyede dönmezse ikinci kopya gönderilir
+    retry_on: yeniden denenecek ve devre kesicide hata sayılacak istisnalar
+    """
+
+    def __init__(self, name: str, rate: float, deadline: float, attempt_timeout: float, hedge_after: float = 0.0,
+                 retry_on: tuple = RETRYABLE_ERRORS, max_attempts: int = UPSTREAM_MAX_ATTEMPTS):
+        self.name = name
+        self.rate = rate
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after
+        self.retry_on = tuple(retry_on) + (UpstreamTimeout,)
+        self.max_attempts = max_attempts
+        self._rate_limits = _parse_rate_limits(UPSTREAM_RATE_LIMITS)
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def bucket(self, model: str) -> TokenBucket:
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = TokenBucket(self._rate_limits.get(model, self.rate))
+            return self._buckets[model]
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(self.name, model)
+            return self._breakers[model]
+
+    def check(self, model: str):
+        """Devre açıksa beklemeden UpstreamUnavailable fırlatır; izin verilirse sonuç record() ile bildirilmelidir"""
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            inc("nlp_upstream_rejections_total", upstream=self.name, reason="circuit_open")
+            raise UpstreamUnavailable(self.name, model, "circuit_open", breaker.retry_after())
+
+    def reject_if_open(self, model: str):
+        """
+        Devre açıksa beklemeden UpstreamUnavailable fırlatır. check()'ten farkı: istek bu çağrıdan sonra
+        hemen gönderilmeyecekse (ör. önce başka bir upstream beklenecekse) half_open deneme hakkını kullanmaz.
+        """
+        breaker = self.breaker(model)
+        if breaker.is_open():
+            inc("nlp_upstream_rejections_total", upstream=self.name, reason="circuit_open")
+            raise UpstreamUnavailable(self.name, model, "circuit_open", breaker.retry_after())
+
+    def record(self, model: str, error: Exception = None):
+        """Çağrının sonucunu devre kesiciye bildirir; yalnızca retry_on hataları upstream arızası sayılır"""
+        if error is None:
+            self.breaker(model).record(True)
+        elif isinstance(error, UpstreamUnavailable):
+            self.breaker(model).record(None)
+        else:
+            # İstemci hataları (ör. 400) upstream'in sağlıklı olduğunu gösterir
+            self.breaker(model).record(False if isinstance(error, self.retry_on) else True)
+
+    def call(self, model: str, fn, key=None, hedge: bool = True):
+        """
+        fn(timeout) çağrısını devre kesici, single-flight, hız sınırı, yeniden deneme ve hedging ile yapar.
+        key verilirse aynı (model, key) ile eşzamanlı çağrılar tek bir istekte birleşir.
+        hedge=False: akışlı yanıtlar gibi kopyası gönderilmemesi gereken istekler için.
+        """
+        self.check(model)
+        if key is None:
+            return self._guarded_call(model, fn, hedge)
+        # Sonuç devre kesiciye yalnızca isteği gerçekten yapan çağrı tarafından bildirilir
+        return self._flight.do((model, key), self._guarded_call, model, fn, hedge)
+
+    def _guarded_call(self, model: str, fn, hedge: bool):
+        try:
+            result = self._call_with_retries(model, fn, hedge)
+        except Exception as e:
+            self.record(model, e)
+            raise
+        self.record(model)
+        return result
+
+    def _call_with_retries(self, model: str, fn, hedge: bool):
+        deadline = time.monotonic() + self.deadline
+        bucket = self.bucket(model)
+        for attempt in range(self.max_attempts):
+            if not bucket.acquire(deadline - time.monotonic() - MIN_ATTEMPT_TIMEOUT):
+                inc("nlp_upstream_rejections_total", upstream=self.name, reason="rate_limited")
+                raise UpstreamUnavailable(self.name, model, "rate_limited")
+
+            timeout = min(self.attempt_timeout, deadline - time.monotonic())
+            try:
+                return self._attempt(fn, timeout, bucket, hedge)
+            except self.retry_on as e:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+                if attempt + 1 == self.max_attempts or time.monotonic() + delay + MIN_ATTEMPT_TIMEOUT > deadline:
+                    raise
+                inc("nlp_upstream_retries_total", upstream=self.name)
+                print(f"⚠️ {self.name} isteği başarısız ({e.__class__.__name__}); {delay:.2f} sn sonra tekrar denenecek")
+                time.sleep(delay)
+
+    def _attempt(self, fn, timeout: float, bucket: TokenBucket, hedge: bool):
+        if not hedge or not self.hedge_after or self.hedge_after >= timeout:
+            return fn(timeout)
+
+        started = time.monotonic()
+        executor = _get_hedge_executor()
+        # İsteğin zamanlama kaydı kopyalara da taşınır
+        pending = {executor.submit(contextvars.copy_context().run, fn, timeout)}
+        done, pending = wait(pending, self.hedge_after)
+        if not done and bucket.try_acquire():
+            inc("nlp_upstream_hedges_total", upstream=self.name)
+            pending.add(executor.submit(contextvars.copy_context().run, fn, timeout - (time.monotonic() - started)))
+
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            remaining = timeout - (time.monotonic() - started)
+            if not pending or remaining <= 0:
+                break
+            # Kopyalardan biri hata verirse diğeri beklenmeye devam eder
+            done, pending = wait(pending, remaining, return_when=FIRST_COMPLETED)
+        if error is not None and not pending:
+            raise error
+        raise UpstreamTimeout(f"{self.name} isteği {timeout:.1f} sn içinde dönmedi")
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.getenv(name, default))
+
+
+def _web_search_errors() -> tuple:
+    # duckduckgo_search yalnızca ilk web aramasında yüklenir; hata türleri de o zaman çözülür
+    from duckduckgo_search.exceptions import DuckDuckGoSearchException
+    return (DuckDuckGoSearchException, OSError)
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def _build_upstream(name: str) -> Upstream:
+    if name == "chat":
+        return Upstream("chat", _env_float("OPENAI_CHAT_RPS", "20"), _env_float("OPENAI_CHAT_DEADLINE", "20"),
+                        _env_float("OPENAI_CHAT_ATTEMPT_TIMEOUT", "10"), _env_float("OPENAI_CHAT_HEDGE_AFTER", "0"))
+    if name == "embedding":
+        return Upstream("embedding", _env_float("OPENAI_EMBEDDING_RPS", "50"), _env_float("OPENAI_EMBEDDING_DEADLINE", "5"),
+                        _env_float("OPENAI_EMBEDDING_ATTEMPT_TIMEOUT", "2"), _env_float("OPENAI_EMBEDDING_HEDGE_AFTER", "0"))
+    if name == "web_search":
+        return Upstream("web_search", _env_float("WEB_SEARCH_RPS", "1"), _env_float("WEB_SEARCH_DEADLINE", "10"),
+                        _env_float("WEB_SEARCH_ATTEMPT_TIMEOUT", "5"), retry_on=_web_search_errors(), max_attempts=2)
+    raise ValueError(f"Bilinmeyen upstream: {name}")
+
+
+def get_upstream(name: str) -> Upstream:
+    """chat | embedding | web_search için süreç genelindeki Upstream nesnesi"""
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _upstreams_lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                upstream = _upstreams[name] = _build_upstream(name)
+    return upstream
@@ -0,0 +1,88 @@
+"""
+Sunucu tarafı sohbet oturumları.
+
+İstemci conversation_history yerine yalnızca session_id gönderebilir; servis son SESSION_MAX_TURNS
+soru-cevap çiftini, son önerilen araçları ve tespit edilen istek türlerini kendisi saklar.
+Varsayılan olarak kayıtlar süreç belleğinde tutulur; SESSION_STORE_PATH verilirse aynı SQLite
+dosyasını paylaşan tüm worker'lar aynı oturumları görür.
+"""
+import os
+
+from cache import TTLCache
+from metrics import register_cache
+from tool_index import get_tool_index
+
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "21600"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH") or None
+# Oturumda saklanan son önerilen araç ve istek türü sayısı
+SESSION_MAX_TRACKED = 5
+
+
+def _empty_session() -> dict:
+    return {"turns": [], "recommended_tools": [], "request_types": []}
+
+
+def _append_bounded(items: list, item, limit: int = SESSION_MAX_TRACKED) -> list:
+    return (items + [item])[-limit:] if item else items
+
+
+class SessionStore:
+    """
+    session_id → sınırlı oturum kaydı:
+        turns: son max_turns soru-cevap çifti (conversation_history biçiminde)
+        recommended_tools: son önerilen araç adları
+        request_types: son tespit edilen istek türleri (new_topic, alternative, grammar, ...)
+    Kayıtlar TTLCache'te LRU + TTL ile tutulur; her yazma TTL'i yeniler.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_STORE_SIZE, ttl: float = SESSION_TTL,
+                 max_turns: int = SESSION_MAX_TURNS, path: str = SESSION_STORE_PATH):
+        self.max_turns = max_turns
+        # Paylaşılan dosyada başka bir worker oturumu güncellemiş olabilir; okumalar dosyadan yapılır
+        self._sessions = TTLCache(max_sessions, ttl, path, namespace="session", shared=True)
+        register_cache("session", self._sessions)
+
+    def get(self, session_id: str) -> dict:
+        return self._sessions.get(session_id) or _empty_session()
+
+    def history(self, session_id: str, message: str = None) -> list:
+        """Oturumun conversation_history karşılığı; message verilirse istemcilerin yaptığı gibi sona eklenir"""
+        turns = self.get(session_id)["turns"]
+        return turns + [{"from": "user", "text": message}] if message is not None else list(turns)
+
+    def record(self, session_id: str, message: str, response: str, recommended_tool: str = None,
+               request_type: str = None) -> dict:
+        """
+        Tamamlanan bir soru-cevap çiftini oturuma ekler; en eski turlar sınırı aşınca atılır.
+        Okuma ve yazma tek işlemde yapılır: aynı oturuma farklı worker'lardan gelen turlar kaybolmaz.
+        """
+        def append(session: dict) -> dict:
+            turns = session["turns"] + [{"from": "user", "text": message}, {"from": "bot", "text": response}]
+            return {
+                "turns": turns[-2 * self.max_turns:],
+                "recommended_tools": _append_bounded(session["recommended_tools"], recommended_tool),
+                "request_types": _append_bounded(session["request_types"], request_type),
+            }
+
+        return self._sessions.update(session_id, append, _empty_session())
+
+    def clear(self, session_id: str):
+        self._sessions.delete(session_id)
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
+
+
+sessions = SessionStore()
+
+
+def record_turn(session_id: str, message: str, response: str, intent_result: dict = None, tool_name: str = None):
+    """/api/chat yanıtını oturuma yazar; önerilen araç yanıt metninden, istek türü intent sonucundan alınır"""
+    recommended = get_tool_index().recommended_tool(response)
+    sessions.record(
+        session_id, message, response,
+        recommended["tool"] if recommended is not None else tool_name,
+        (intent_result or {}).get("request_type"),
+    )
@@ -0,0 +1,71 @@
+"""
+Worker başlangıcı ve ısınma (warm-up).
+
+Ağır bağımlılıklar (langchain, FAISS, duckduckgo_search) yalnızca onlara ihtiyaç duyan araç bazlı
+yanıt ilk kez üretildiğinde yüklenir ve OpenAI client'ları ilk istekte kurulur. İstek yolunun
+her seferinde ihtiyaç duyduğu şeyler (araç indeksi, intent centroid'leri) ise warm_up() ile, istek
+kabul edilmeden önce açıkça hazırlanır. Her adımın süresi loglanır; başarısız bir adım worker'ı
+durdurmaz. Centroid'ler yalnızca depodan okunur: örnek vektörleri eksikse centroid katmanı kapalı
+kalır ve intent'ler kurallar ile LLM'den gelir.
+
+Eksik embedding'leri tamamlamak ayrı bir komuttur (python build_index.py) ve fork'tan önce bir kez
+çalıştırılmalıdır; aksi halde her worker aynı metinleri aynı anda embed edip depoya yazmaya çalışır.
+BUILD_INDEX_ON_STARTUP=true yalnızca tek süreçli geliştirme ortamı içindir.
+
+Bu modül sunum modüllerinde (app.py, asgi_app.py) ilk import edilmelidir; import süresi buradan ölçülür.
+"""
+import os
+import time
+
+_started = time.perf_counter()
+
+from dotenv import load_dotenv
+
+# .env, modül düzeyinde os.getenv okuyan servis modüllerinden (embedders, resilience, metrics, ...) önce yüklenmeli
+load_dotenv()
+
+from build_index import build_index
+from metrics import set_gauge
+from rag import get_tool_index, intent_classifier
+
+_imported = time.perf_counter()
+
+BUILD_INDEX_ON_STARTUP = os.getenv("BUILD_INDEX_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+# adım adı → süre (sn); warm_up() sonrasında doldurulur
+_report = {}
+
+
+def warm_up(build: bool = BUILD_INDEX_ON_STARTUP) -> dict:
+    """
+    Araç indeksini ve intent centroid'lerini yükler (build=True ise önce eksik embedding'leri tamamlar);
+    başlangıç raporunu döndürür. Hata veren adımlar loglanır ve atlanır.
+    """
+    steps = [
+        ("tool_index", get_tool_index),
+        ("intent_centroids", intent_classifier.prepare),
+    ]
+    if build:
+        steps.insert(0, ("build_index", build_index))
+    report = {"import": _imported - _started}
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"⚠️ Başlangıç adımı başarısız ({name}): {e}")
+            set_gauge("nlp_startup_failed", 1, step=name)
+        report[name] = time.perf_counter() - step_started
+    report["total"] = time.perf_counter() - _started
+
+    _report.clear()
+    _report.update(report)
+    for name, seconds in report.items():
+        set_gauge("nlp_startup_seconds", seconds, step=name)
+    print("🚀 Başlangıç süresi: " + ", ".join(f"{name} {seconds:.2f} sn" for name, seconds in report.items()))
+    return dict(report)
+
+
+def startup_report() -> dict:
+    """Son warm_up() çağrısının adım süreleri; henüz ısınılmadıysa boş"""
+    return dict(_report)
@@ -0,0 +1,61 @@
+"""
+/api/chat için akışlı (Server-Sent Events) yanıt yardımcıları.
+
+İstemci gövdeye "stream": true ekleyerek ya da Accept: text/event-stream göndererek akışlı modu seçer.
+Olaylar sırasıyla:
+    event: meta   data: {"tool_name": ..., "matched_tool": ...}
+                                                     ilk parça hazır olur olmaz; matched_tool araç bazlı
+                                                     sohbette tool_name, genel sohbette önerilen araçtır
+    event: token  data: {"text": "..."}              yanıt parçaları üretildikçe
+    event: done   data: {"response": "..."}          tam yanıt (non-stream yanıtla aynı metin)
+    event: error  data: {"error": "..."}             akış yarıda kesilirse
+"""
+import json
+
+SSE_MIMETYPE = "text/event-stream"
+# Proxy'lerin (nginx vb.) yanıtı tamponlamaması için
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def wants_stream(data: dict, accept: str = "") -> bool:
+    return bool(data.get("stream")) or SSE_MIMETYPE in (accept or "")
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_error_event(language: str) -> str:
+    if language == "en":
+        return sse_event("error", {"error": "The answer could not be completed, please try again."})
+    return sse_event("error", {"error": "Yanıt tamamlanamadı, lütfen tekrar deneyin."})
+
+
+def chat_events(chunks, tool_name: str = None, language: str = "tr", matched_tool: str = None):
+    """Yanıt parçalarını SSE olaylarına çevirir"""
+    yield sse_event("meta", {"tool_name": tool_name, "matched_tool": matched_tool})
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+    except Exception as e:
+        print(f"❌ Streaming error: {e}")
+        yield _stream_error_event(language)
+        return
+    yield sse_event("done", {"response": "".join(parts)})
+
+
+async def chat_events_async(chunks, tool_name: str = None, language: str = "tr", matched_tool: str = None):
+    """chat_events'in async karşılığı; chunks bir async iterator'dır"""
+    yield sse_event("meta", {"tool_name": tool_name, "matched_tool": matched_tool})
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+    except Exception as e:
+        print(f"❌ Streaming error: {e}")
+        yield _stream_error_event(language)
+        return
+    yield sse_event("done", {"response": "".join(parts)})
@@ -0,0 +1,33 @@
+import re
+
+# str.lower() "İ" harfini "i̇" (noktalı i + birleşik nokta) yapar, "I" harfini de "i" yapar;
+# Türkçe için ikisini önceden doğru küçük harfe çeviriyoruz
+_TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+# Türkçe karakter kullanmadan yazılan mesajlar ("tesekkurler") için ASCII katlama
+_ASCII_FOLD = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Türkçe'ye duyarlı küçük harfe çevirir ve boşlukları tek boşluğa indirir"""
+    return " ".join(text.translate(_TURKISH_LOWER).lower().split())
+
+
+def fold_ascii(text: str) -> str:
+    """Küçük harfli metindeki Türkçe karakterleri ASCII karşılıklarına çevirir"""
+    return text.translate(_ASCII_FOLD)
+
+
+def tokenize(text: str) -> list:
+    """Noktalama ve emojileri atarak normalize edilmiş, ASCII'ye katlanmış kelimeleri döndürür"""
+    return _WORD_RE.findall(fold_ascii(normalize_text(text)))
+
+
+# Tool adını URL slug'a çevir
+def tool_to_slug(tool_name: str) -> str:
+    """Tool adını URL slug formatına çevirir"""
+    # Küçük harfe çevir ve özel karakterleri tire ile değiştir
+    slug = re.sub(r'[^a-z0-9]+', '-', tool_name.lower())
+    # Başta ve sonunda tire varsa temizle
+    slug = slug.strip('-')
+    return slug
@@ -0,0 +1,364 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from embedders import OPENAI_EMBEDDING_MODEL, get_embedder, model_dir
+from embedding_store import STORE_DIR, EmbeddingStore, embedding_key
+from lexical_index import LexicalIndex, LEXICAL_SATURATION, LEXICAL_WEIGHT
+from text_utils import tokenize
+
+TOOLS_PATH = Path("tools.json")
+# Eski JSON cache; yalnızca embedding deposuna tek seferlik göç için okunur
+CACHE_PATH = Path("embedding_cache.json")
+# EMBEDDER ile seçilen backend'in model adı; depo, cache anahtarları ve indeks generation'ı buna bağlıdır
+EMBEDDING_MODEL = get_embedder().model
+# Kategorisi olmayan araçlar için önerilecek en yakın komşu sayısı
+NEIGHBOUR_COUNT = 5
+# Araç-araç benzerlik matrisi ve float16 matris üzerindeki skorlar bu kadar satırlık bloklar halinde hesaplanır
+_SIMILARITY_BLOCK = 1024
+# Worker'ların paylaştığı normalize araç matrisinin tipi: float32 ya da yarı bellek için float16
+TOOL_MATRIX_DTYPE = np.dtype(os.getenv("TOOL_MATRIX_DTYPE", "float32"))
+
+
+def embedding_text(tool: dict) -> str:
+    """Bir aracın embedding'i alınacak metnini üretir"""
+    return f"{tool['tool']}. {tool['academic_use']}. Keywords: {'; '.join(tool['keywords'])}."
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Satırları birim uzunluğa getirir, böylece cosine similarity tek bir dot product olur"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ToolIndex:
+    """
+    Süreç boyunca bellekte tutulan araç indeksi.
+    tools: tools.json kayıtları (sırası korunur)
+    by_name: araç adı → araç kaydı
+    embeddings: vector_tools ile aynı sırada, satırları normalize edilmiş salt okunur matris
+    vector_tools: embedding'i depoda bulunan araçlar (build_index.py henüz çalışmadıysa tools'un alt kümesi)
+    lexical: tools üzerinde BM25 ters indeksi
+    by_category: kategori → araçlar (tools.json'daki "categories" alanından; "category_rank" sırası, sonra tools sırası)
+    alternatives: araç adı → embedding yakınlığına göre sıralı alternatif araçlar
+    """
+
+    def __init__(self, tools: list, embeddings: np.ndarray, fingerprint: str, vector_tools: list = None,
+                 normalized: bool = False):
+        self.tools = tools
+        self.by_name = {tool["tool"]: tool for tool in tools}
+        self.vector_tools = tools if vector_tools is None else vector_tools
+        # normalized=True: satırlar zaten birim uzunlukta (ör. paylaşılan memory-mapped matris); kopya alınmaz
+        self.embeddings = embeddings if normalized else _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if self.embeddings.flags.writeable:
+            self.embeddings.setflags(write=False)
+        self.fingerprint = fingerprint
+        self.lexical = LexicalIndex(tools)
+        positions = {tool["tool"]: i for i, tool in enumerate(tools)}
+        # vector_tools satırlarının lexical skor dizisindeki karşılıkları
+        self._vector_positions = np.array([positions[tool["tool"]] for tool in self.vector_tools], dtype=np.int64)
+
+        # Araç adlarının kelimeleri ("grammarly", "scite", ...); kural katmanı bunları içerik kelimesi sayar
+        self.name_tokens = {token for tool in tools for token in tokenize(tool["tool"])}
+
+        self.by_category = {}
+        for tool in tools:
+            for category in tool.get("categories", []):
+                self.by_category.setdefault(category, []).append(tool)
+        # Kategori önerisinin varsayılanı ilk araçtır: "category_rank" verilen araçlar sırasıyla öne alınır
+        # (ör. dil kontrolünde Grammarly, referans kontrolünde Scite.ai), kalanlar tools.json sırasını korur
+        for category, category_tools in self.by_category.items():
+            category_tools.sort(key=lambda tool: tool.get("category_rank", {}).get(category, float("inf")))
+
+        # Bot mesajlarında satır başında "Araç Adı:" biçimindeki öneriyi bulan tek regex (uzun adlar önce)
+        names = sorted(self.by_name, key=len, reverse=True)
+        self._recommendation_re = re.compile(
+            r"^(" + "|".join(map(re.escape, names)) + r"):", re.MULTILINE
+        ) if names else None
+
+        self.alternatives = self._build_alternatives()
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def get(self, tool_name: str):
+        return self.by_name.get(tool_name)
+
+    def tools_in_category(self, category: str) -> list:
+        return self.by_category.get(category, [])
+
+    def category_peers(self, tool: dict) -> list:
+        """Aracın kategorilerindeki diğer araçlar (tekrarsız, kategori sırasıyla)"""
+        peers = {}
+        for category in tool.get("categories", []):
+            for peer in self.by_category[category]:
+                if peer["tool"] != tool["tool"]:
+                    peers[peer["tool"]] = peer
+        return list(peers.values())
+
+    def recommended_tool(self, text: str):
+        """Bir bot mesajında önerilen aracı (satır başındaki "Araç Adı:") döndürür"""
+        if self._recommendation_re is None:
+            return None
+        match = self._recommendation_re.search(text)
+        return self.by_name[match.group(1)] if match else None
+
+    def recommended_tools(self, conversation_history: list) -> list:
+        """Konuşmadaki bot mesajlarında önerilen araçlar, eskiden yeniye"""
+        tools = []
+        for msg in conversation_history or []:
+            if msg.get("from") == "bot":
+                tool = self.recommended_tool(msg.get("text", ""))
+                if tool is not None:
+                    tools.append(tool)
+        return tools
+
+    def last_recommended(self, conversation_history: list):
+        """Konuşmada en son önerilen araç; geçmiş sondan taranır ve ilk öneride durulur"""
+        for msg in reversed(conversation_history or []):
+            if msg.get("from") == "bot":
+                tool = self.recommended_tool(msg.get("text", ""))
+                if tool is not None:
+                    return tool
+        return None
+
+    def _build_alternatives(self) -> dict:
+        """
+        Araç-araç cosine benzerliklerinden her araç için alternatif listesini önceden hesaplar.
+        Kategori komşuları benzerliğe göre sıralanır; kategorisi olmayan araçlara en yakın
+        NEIGHBOUR_COUNT araç önerilir. Embedding'i olmayan araçlar kategori sırasını korur.
+        """
+        alternatives = {tool["tool"]: self.category_peers(tool) for tool in self.tools}
+        rows = {tool["tool"]: i for i, tool in enumerate(self.vector_tools)}
+
+        for start in range(0, len(self.vector_tools), _SIMILARITY_BLOCK):
+            block = self.scores(self.embeddings[start:start + _SIMILARITY_BLOCK].astype(np.float32))
+            for offset, similarities in enumerate(block):
+                tool = self.vector_tools[start + offset]
+                category_peers = alternatives[tool["tool"]]
+                peers = [rows[peer["tool"]] for peer in category_peers if peer["tool"] in rows]
+                if peers:
+                    candidates = np.array(peers)
+                else:
+                    k = min(NEIGHBOUR_COUNT + 1, len(similarities))
+                    candidates = np.argpartition(-similarities, k - 1)[:k]
+                ranked = candidates[np.argsort(-similarities[candidates], kind="stable")]
+                alternatives[tool["tool"]] = [self.vector_tools[i] for i in ranked if i != start + offset] + [
+                    peer for peer in category_peers if peer["tool"] not in rows
+                ]
+        return alternatives
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Normalize float32 sorgu satırlarının tüm araçlarla cosine skorları (sorgu × araç, float32).
+        float16 matriste `queries @ embeddings.T` tüm matrisin geçici bir float32 kopyasını çıkarır;
+        bu yüzden matris blok blok float32'ye çevrilir ve ek bellek bir blokla sınırlı kalır.
+        """
+        if self.embeddings.dtype == np.float32:
+            return queries @ self.embeddings.T
+        scores = np.empty((len(queries), len(self.embeddings)), dtype=np.float32)
+        for start in range(0, len(self.embeddings), _SIMILARITY_BLOCK):
+            block = self.embeddings[start:start + _SIMILARITY_BLOCK].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def search(self, query_vec, k: int = 5, min_score: float = -1.0) -> list:
+        """Sorguya en yakın k aracı skora göre azalan sırada (araç, skor) çiftleri olarak döndürür"""
+        return self.search_batch([query_vec], k, min_score)[0]
+
+    def search_batch(self, query_vecs, k: int = 5, min_score: float = -1.0) -> list:
+        """
+        Birden fazla sorguyu tek bir matris çarpımıyla skorlar.
+        Her sorgu için search() ile aynı biçimde bir liste döndürür.
+        """
+        k = min(k, len(self.vector_tools))
+        if k <= 0:
+            return [[] for _ in range(len(query_vecs))]
+
+        queries = _normalize_rows(np.asarray(query_vecs, dtype=np.float32).reshape(-1, self.embeddings.shape[1]))
+        scores = self.scores(queries)
+
+        # Tam sıralama yerine sadece ilk k adayı seç, sonra yalnızca onları sırala
+        if k < len(self.vector_tools):
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(k), (len(queries), k))
+
+        results = []
+        for row, row_candidates in zip(scores, candidates):
+            ranked = row_candidates[np.argsort(-row[row_candidates], kind="stable")]
+            results.append([(self.vector_tools[i], float(row[i])) for i in ranked if row[i] >= min_score])
+        return results
+
+
+    def hybrid_search(self, query_text: str, query_vec, k: int = 5, min_score: float = -1.0,
+                      lexical_weight: float = LEXICAL_WEIGHT) -> list:
+        """
+        Vektör ve BM25 skorlarını birleştirir: cosine + lexical_weight * bm25 / (bm25 + LEXICAL_SATURATION).
+        min_score birleşik skora uygulanır; böylece sorguyla sözcük eşleşmesi olan araçlar cosine
+        eşiğinin biraz altında kalsalar da aday olabilir.
+        """
+        k = min(k, len(self.vector_tools))
+        if k <= 0:
+            return []
+
+        query = np.asarray(query_vec, dtype=np.float32).reshape(1, self.embeddings.shape[1])
+        scores = self.scores(_normalize_rows(query))[0]
+        lexical_scores = self.lexical.scores(query_text)[self._vector_positions]
+        scores = scores + lexical_weight * lexical_scores / (lexical_scores + LEXICAL_SATURATION)
+
+        if k < len(self.vector_tools):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(k)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.vector_tools[i], float(scores[i])) for i in ranked if scores[i] >= min_score]
+
+
+def _file_stamp(path: Path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+_stores = {}
+
+
+def get_embedding_store(model: str = EMBEDDING_MODEL) -> EmbeddingStore:
+    """Süreç genelindeki embedding deposu; her modelin kendi dizini ve generation'ı vardır"""
+    store = _stores.get(model)
+    if store is None:
+        store = _stores.setdefault(model, EmbeddingStore(model_dir(STORE_DIR, model)))
+    return store
+
+
+def _source_stamps(model: str = EMBEDDING_MODEL) -> tuple:
+    return (_file_stamp(TOOLS_PATH), _file_stamp(get_embedding_store(model).manifest_path))
+
+
+def _source_fingerprint(model: str = EMBEDDING_MODEL) -> str:
+    """tools.json içeriği + model adı + modelin embedding deposu generation'ı"""
+    digest = hashlib.sha256(TOOLS_PATH.read_bytes())
+    digest.update(f"\n{model}\n{get_embedding_store(model).generation}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_tools() -> list:
+    return json.loads(TOOLS_PATH.read_text(encoding="utf-8"))
+
+
+def migrate_legacy_cache(store: EmbeddingStore, tools: list, model: str = EMBEDDING_MODEL):
+    """Depo boşsa ve eski embedding_cache.json (ada vektörleri) varsa vektörleri tek seferlik depoya taşır"""
+    if model == OPENAI_EMBEDDING_MODEL and len(store) == 0 and CACHE_PATH.exists():
+        store.migrate_json_cache(CACHE_PATH, {tool["tool"]: embedding_text(tool) for tool in tools}, model)
+
+
+def _tool_matrix_path(fingerprint: str, model: str = EMBEDDING_MODEL) -> Path:
+    return get_embedding_store(model).path / f"tool-matrix-{fingerprint[:16]}-{TOOL_MATRIX_DTYPE.name}.npy"
+
+
+def load_tool_matrix(fingerprint: str, rows: int, model: str = EMBEDDING_MODEL):
+    """Bu parmak izi için yayınlanmış normalize matrisi memory-map ile açar; yoksa None"""
+    path = _tool_matrix_path(fingerprint, model)
+    try:
+        matrix = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+    return matrix if matrix.shape[0] == rows else None
+
+
+def publish_tool_matrix(fingerprint: str, embeddings: np.ndarray, model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """
+    Normalize araç matrisini parmak iziyle adlandırılmış tek bir .npy dosyası olarak yayınlar ve
+    memory-map ile geri açar. Aynı dosyayı açan tüm worker'lar işletim sisteminin sayfa önbelleğindeki
+    tek kopyayı paylaşır; worker ya da araç eklendikçe süreç başına bellek artmaz.
+    """
+    path = _tool_matrix_path(fingerprint, model)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, _normalize_rows(np.asarray(embeddings, dtype=np.float32)).astype(TOOL_MATRIX_DTYPE))
+    os.replace(tmp_path, path)
+
+    # Eski generation'lar silinir; onları hâlâ açık tutan worker'lar kendi eşlemelerini kullanmaya devam eder
+    for stale_path in path.parent.glob("tool-matrix-*.npy"):
+        if stale_path != path:
+            try:
+                stale_path.unlink()
+            except OSError:
+                pass
+    return np.load(path, mmap_mode="r")
+
+
+def build_tool_index(model: str = EMBEDDING_MODEL) -> ToolIndex:
+    """
+    tools.json + embedding deposundan yeni bir indeks kurar. Hiçbir API çağrısı yapmaz:
+    eksik embedding'ler build_index.py ile toplu olarak üretilir, o zamana kadar ilgili araçlar
+    vektör aramasına katılmaz.
+    Normalize matris bu generation için daha önce yayınlandıysa (başka bir worker ya da build_index.py
+    tarafından) yalnızca memory-map ile açılır, yayınlanmadıysa bir kez hesaplanıp yayınlanır.
+    """
+    tools = load_tools()
+    store = get_embedding_store(model)
+    store.refresh()
+    migrate_legacy_cache(store, tools, model)
+
+    # Metni değişen araçların anahtarı da değişir, böylece bayat vektörler kendiliğinden geçersiz olur
+    keys = [embedding_key(embedding_text(tool), model) for tool in tools]
+    vector_tools = [tool for tool, key in zip(tools, keys) if key in store]
+    vector_keys = [key for key in keys if key in store]
+
+    if len(vector_tools) < len(tools):
+        print(f"⚠️ {len(tools) - len(vector_tools)} aracın embedding'i yok; 'python build_index.py' çalıştırın")
+
+    fingerprint = _source_fingerprint(model)
+    if not vector_tools:
+        return ToolIndex(tools, np.zeros((0, 0), dtype=np.float32), fingerprint, vector_tools)
+
+    embeddings = load_tool_matrix(fingerprint, len(vector_tools), model)
+    if embeddings is None:
+        embeddings = publish_tool_matrix(fingerprint, store.get_many(vector_keys), model)
+    return ToolIndex(tools, embeddings, fingerprint, vector_tools, normalized=True)
+
+
+# model → (indeks, kaynak damgaları); her backend kendi indeksini ve generation'ını tutar
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_tool_index(model: str = EMBEDDING_MODEL) -> ToolIndex:
+    """
+    Süreç genelindeki indeksi döndürür.
+    Dosyaların mtime/boyutu değişmediyse hiçbir şey okunmaz; değiştiyse içerik hash'i
+    karşılaştırılır ve yalnızca içerik gerçekten farklıysa yeni indeks kurulup tek atamayla devreye alınır.
+    """
+    stamps = _source_stamps(model)
+    index, index_stamps = _indexes.get(model, (None, None))
+    if index is not None and stamps == index_stamps:
+        return index
+
+    with _index_lock:
+        index, index_stamps = _indexes.get(model, (None, None))
+        if index is not None and stamps == index_stamps:
+            return index
+
+        get_embedding_store(model).refresh()
+        if index is not None and _source_fingerprint(model) == index.fingerprint:
+            _indexes[model] = (index, stamps)
+            return index
+
+        new_index = build_tool_index(model)
+        if index is not None:
+            print(f"🔄 Araç indeksi yeniden yüklendi: {len(new_index)} araç")
+        # Kurulumdan önce okunan damgalar saklanır: kurulum sırasında dosyalar değişirse bir sonraki
+        # çağrı farkı görüp yeniden kontrol eder (sonraki damgalar eski içeriğe iliştirilmez)
+        _indexes[model] = (new_index, stamps)
+        return new_index
@@ -1,54 +1,119 @@
 import os
-import json
-import requests
-from bs4 import BeautifulSoup
-from pathlib import Path
-from typing import Dict, List
-import time
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI
-from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
-from duckduckgo_search import DDGS
 import openai
+from cache import TTLCache, SingleFlight, cache_key
+from metrics import count_fallback, count_openai_call, register_cache, span
+from resilience import UpstreamUnavailable, get_upstream
 
 load_dotenv()
 
 # Artık web scraping kullanmıyoruz - sadece web search + ChatGPT
 
+# Arama sonuçları ve üretilen yanıtlar (soru, dil) bazında TTL ile saklanır
+CONSENSUS_CACHE_TTL = float(os.getenv("CONSENSUS_CACHE_TTL", "21600"))
+_cache_path = os.getenv("QUERY_CACHE_PATH") or None
+search_cache = TTLCache(1000, CONSENSUS_CACHE_TTL, _cache_path, namespace="web_search")
+answer_cache = TTLCache(1000, CONSENSUS_CACHE_TTL, _cache_path, namespace="consensus_answer")
+# Aynı soru için eşzamanlı istekler tek bir arama + özetlemeyi paylaşır
+_consensus_flight = SingleFlight()
+register_cache("web_search", search_cache)
+register_cache("consensus_answer", answer_cache)
+
+_client = None
+
+def get_openai_client() -> openai.OpenAI:
+    """Bağlantı havuzunu paylaşmak için süreç boyunca tek bir OpenAI client kullanılır"""
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+def chat_completion(prompt: str, model: str = "gpt-3.5-turbo", **kwargs) -> str:
+    """
+    Tek mesajlık chat completion; hız sınırı, yeniden deneme ve devre kesici resilience.py'den gelir.
+    Aynı prompt ve parametrelerle eşzamanlı çağrılar tek bir istekte birleşir.
+    """
+    def create(timeout):
+        return get_openai_client().with_options(timeout=timeout, max_retries=0).chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+
+    key = cache_key(prompt, f"{model}:{sorted(kwargs.items())}")
+    response = get_upstream("chat").call(model, create, key=key)
+    count_openai_call("chat", model, response.usage)
+    return response.choices[0].message.content
+
+def stream_chat_completion(prompt: str, model: str = "gpt-3.5-turbo", **kwargs):
+    """Chat completion token'larını geldikçe yield eder; token kullanımı akışın son parçasında gelir"""
+    def create(timeout):
+        return get_openai_client().with_options(timeout=timeout, max_retries=0).chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+
+    with span("summarization"):
+        # Yalnızca akışın açılması yeniden denenir; token'lar gelmeye başladıktan sonra kopya gönderilmez
+        stream = get_upstream("chat").call(model, create, hedge=False)
+        usage = None
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        count_openai_call("chat", model, usage)
+
+def search_consensus_results(search_query: str) -> list:
+    """DuckDuckGo arama sonuçlarını döndürür; aynı sorgu TTL süresince tekrar aranmaz"""
+    results = search_cache.get(search_query)
+    if results is None:
+        print(f"🔍 Web search: {search_query}")
+        # duckduckgo_search yalnızca ilk web aramasında yüklenir; ana öneri yolu hiç ihtiyaç duymaz
+        from duckduckgo_search import DDGS
+        def search(timeout):
+            with DDGS(timeout=timeout) as ddgs:
+                return list(ddgs.text(search_query, max_results=5))
+
+        with span("web_search"):
+            results = get_upstream("web_search").call("duckduckgo", search, key=search_query)
+        if results:
+            search_cache.set(search_query, results)
+    return results
+
 def search_web_for_consensus(question: str, language: str = "tr") -> str:
     """Web'de Consensus hakkında arama yapar ve ChatGPT ile özetler"""
-    try:
-        # Search query hazırla
-        if language == "en":
-            search_query = f"Consensus.app {question} AI research tool academic papers"
-        else:
-            search_query = f"Consensus.app {question} yapay zeka araştırma aracı akademik makaleler"
-        
-        print(f"🔍 Web search: {search_query}")
-        
-        # DuckDuckGo ile arama
-        with DDGS() as ddgs:
-            results = list(ddgs.text(search_query, max_results=5))
-        
-        if not results:
-            return ""
-        
-        # Arama sonuçlarını birleştir
-        search_content = ""
-        for result in results:
-            search_content += f"Title: {result.get('title', '')}\n"
-            search_content += f"Summary: {result.get('body', '')}\n"
-            search_content += f"URL: {result.get('href', '')}\n\n"
-        
-        # ChatGPT ile özetle
-        api_key = os.getenv("OPENAI_API_KEY")
-        client = openai.OpenAI(api_key=api_key)
-        
-        if language == "en":
-            prompt = f"""Based on the following web search results about Consensus.app, provide a short, clear and helpful answer to the user's question: "{question}"
+    key = cache_key(question, f"consensus:{language}")
+    answer = answer_cache.get(key)
+    if answer is not None:
+        return answer
+    return _consensus_flight.do(key, _search_and_summarize_consensus, question, language, key)
+
+def build_consensus_prompt(question: str, language: str = "tr") -> str:
+    """Web araması yapıp özetleme prompt'unu hazırlar; arama sonuç vermezse boş string döner"""
+    # Search query hazırla
+    if language == "en":
+        search_query = f"Consensus.app {question} AI research tool academic papers"
+    else:
+        search_query = f"Consensus.app {question} yapay zeka araştırma aracı akademik makaleler"
+    
+    # DuckDuckGo ile arama
+    results = search_consensus_results(search_query)
+    
+    if not results:
+        return ""
+    
+    # Arama sonuçlarını birleştir
+    search_content = ""
+    for result in results:
+        search_content += f"Title: {result.get('title', '')}\n"
+        search_content += f"Summary: {result.get('body', '')}\n"
+        search_content += f"URL: {result.get('href', '')}\n\n"
+    
+    if language == "en":
+        prompt = f"""Based on the following web search results about Consensus.app, provide a short, clear and helpful answer to the user's question: "{question}"
 
 Web search results:
 {search_content}
@@ -60,8 +125,8 @@ Requirements:
 - If you can't find specific information, say so briefly
 
 Answer:"""
-        else:
-            prompt = f"""Aşağıdaki Consensus.app hakkındaki web arama sonuçlarına dayanarak, kullanıcının sorusuna kısa, net ve yardımcı bir yanıt verin: "{question}"
+    else:
+        prompt = f"""Aşağıdaki Consensus.app hakkındaki web arama sonuçlarına dayanarak, kullanıcının sorusuna kısa, net ve yardımcı bir yanıt verin: "{question}"
 
 Web arama sonuçları:
 {search_content}
@@ -73,22 +138,57 @@ Gereksinimler:
 - Spesifik bilgi bulamazsanız bunu kısaca belirtin
 
 Yanıt:"""
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=150
-        )
-        
-        answer = response.choices[0].message.content.strip()
+    return prompt
+
+def _search_and_summarize_consensus(question: str, language: str, key: str) -> str:
+    try:
+        prompt = build_consensus_prompt(question, language)
+        if not prompt:
+            return ""
+
+        # ChatGPT ile özetle
+        with span("summarization"):
+            answer = chat_completion(prompt, "gpt-3.5-turbo", temperature=0.1, max_tokens=150).strip()
         print(f"✅ Web search answer generated")
+        if answer:
+            answer_cache.set(key, answer)
         return answer
-        
+
+    except UpstreamUnavailable:
+        # Devre açık: çağıran beklemeden tools.json yanıtına düşer
+        raise
     except Exception as e:
         print(f"❌ Web search error: {e}")
+        count_fallback("web_search")
         return ""
 
+def consensus_site_footer(language: str = "tr") -> str:
+    if language == "en":
+        return """
+
+🌐 **Official site:** https://consensus.app"""
+    return """
+
+🌐 **Resmi site:** https://consensus.app"""
+
+def consensus_not_found_message(language: str = "tr") -> str:
+    if language == "en":
+        return """I couldn't find specific information about that. Please try asking a more specific question about Consensus.app or visit the official website.
+
+🌐 **Visit:** https://consensus.app"""
+    return """Bu konuda spesifik bilgi bulamadım. Lütfen Consensus.app hakkında daha spesifik bir soru sorun veya resmi web sitesini ziyaret edin.
+
+🌐 **Ziyaret edin:** https://consensus.app"""
+
+def consensus_error_message(language: str = "tr") -> str:
+    if language == "en":
+        return """I'm having trouble finding information right now. Please visit the official Consensus.app website.
+
+🌐 **Visit:** https://consensus.app"""
+    return """Şu anda bilgi bulmakta sorun yaşıyorum. Lütfen resmi Consensus.app web sitesini ziyaret edin.
+
+🌐 **Ziyaret edin:** https://consensus.app"""
+
 def get_consensus_answer(question: str, language: str = "tr") -> str:
     """Consensus hakkında soru-cevap - SADECE web search + ChatGPT"""
     
@@ -98,35 +198,55 @@ def get_consensus_answer(question: str, language: str = "tr") -> str:
         
         if web_answer and len(web_answer.strip()) > 10:
             # Web search başarılı
-            if language == "en":
-                return f"""{web_answer}
-
-🌐 **Official site:** https://consensus.app"""
-            else:
-                return f"""{web_answer}
-
-🌐 **Resmi site:** https://consensus.app"""
+            return f"{web_answer}{consensus_site_footer(language)}"
         else:
             # Web search başarısızsa, basit hata mesajı
-            if language == "en":
-                return f"""I couldn't find specific information about that. Please try asking a more specific question about Consensus.app or visit the official website.
-
-🌐 **Visit:** https://consensus.app"""
-            else:
-                return f"""Bu konuda spesifik bilgi bulamadım. Lütfen Consensus.app hakkında daha spesifik bir soru sorun veya resmi web sitesini ziyaret edin.
+            return consensus_not_found_message(language)
 
-🌐 **Ziyaret edin:** https://consensus.app"""
-        
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         print(f"❌ Consensus Answer Error: {e}")
-        if language == "en":
-            return """I'm having trouble finding information right now. Please visit the official Consensus.app website.
-
-🌐 **Visit:** https://consensus.app"""
-        else:
-            return """Şu anda bilgi bulmakta sorun yaşıyorum. Lütfen resmi Consensus.app web sitesini ziyaret edin.
-
-🌐 **Ziyaret edin:** https://consensus.app"""
+        return consensus_error_message(language)
+
+def stream_consensus_answer(question: str, language: str = "tr"):
+    """
+    get_consensus_answer'ın akışlı karşılığı. Önbellekteki yanıt tek parça halinde hemen döner;
+    yoksa arama biter bitmez özetleme token'ları üretildikçe yield edilir ve tam yanıt önbelleğe yazılır.
+    """
+    key = cache_key(question, f"consensus:{language}")
+    answer = answer_cache.get(key)
+    if answer is not None:
+        yield f"{answer}{consensus_site_footer(language)}"
+        return
+
+    parts = []
+    try:
+        prompt = build_consensus_prompt(question, language)
+        if not prompt:
+            yield consensus_not_found_message(language)
+            return
+
+        for token in stream_chat_completion(prompt, "gpt-3.5-turbo", temperature=0.1, max_tokens=150):
+            parts.append(token)
+            yield token
+    except UpstreamUnavailable:
+        # Akış açılmadan reddedildi; henüz hiçbir parça gönderilmedi
+        raise
+    except Exception as e:
+        print(f"❌ Consensus stream error: {e}")
+        count_fallback("web_search")
+        # Yarım kalan yanıt önbelleğe yazılmaz
+        yield consensus_site_footer(language) if parts else consensus_error_message(language)
+        return
+
+    answer = "".join(parts).strip()
+    if not answer:
+        yield consensus_not_found_message(language)
+        return
+    print(f"✅ Web search answer streamed")
+    answer_cache.set(key, answer)
+    yield consensus_site_footer(language)
 
 if __name__ == "__main__":
     # Test